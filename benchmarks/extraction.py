@@ -0,0 +1,56 @@
+"""CPU time per article for the scraper's HTML extraction.
+
+Runs the original full-tree BeautifulSoup parse and WebScraper.extract_content
+over the fixture corpus in tests/fixtures/articles and reports milliseconds of
+CPU time per article for each, after checking that both give the same text.
+
+    python benchmarks/extraction.py [--repeat 50]
+"""
+import argparse
+import glob
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from nlp.classes import WebScraper, html_parser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "fixtures", "articles")
+
+
+def full_tree(html):
+    soup = BeautifulSoup(html, "html.parser")
+    article_content = soup.find("div", {"class": "caas-body"}) or soup.find("article")
+    return article_content.text if article_content else None
+
+
+def cpu_ms_per_article(extract, pages, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    return (time.process_time() - start) * 1000 / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        with open(path, "r", encoding="utf-8") as file:
+            pages.append(file.read())
+    for html in pages:
+        assert WebScraper.extract_content(html) == full_tree(html)
+
+    baseline = cpu_ms_per_article(full_tree, pages, args.repeat)
+    targeted = cpu_ms_per_article(WebScraper.extract_content, pages, args.repeat)
+    print("%d fixture pages, %d repeats" % (len(pages), args.repeat))
+    print("full tree (html.parser):      %.2f ms/article" % baseline)
+    print("targeted (%s + strainer): %.2f ms/article" % (html_parser, targeted))
+    print("speedup: %.1fx" % (baseline / targeted))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""End-to-end latency and throughput of the pipeline against local fakes.
+
+Starts a local HTTP server that stands in for the OpenAI chat, TTS and
+embedding endpoints, the yfinance news feed and the article pages, and
+swaps the Stability Animator for a local frame writer. Requests are then
+driven through the CLI path (the `nlp chat` sequence, in threads) and the
+Flask path (POST /process, then polling /jobs/<id>) at each concurrency
+level, followed by questions through Conversation.query and
+/handle_question. Every fake has a configurable latency and payload size,
+and nothing touches the network.
+
+    python benchmarks/pipeline.py [--paths cli flask] [--concurrency 1 4 16]
+        [--requests 16] [--formats text audio] [--json results.json]
+        [--baseline previous.json]
+
+Each round uses fresh tickers, so caches start cold; pass --warm to repeat
+the same tickers after a warm-up pass instead, or --prefetch to have the
+Prefetcher refresh the round's tickers first, as it would in the
+background. Research, caches and the
+question index live in a temporary NLP_HOME that is removed afterwards.
+"""
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+vocabulary = (
+    "revenue earnings guidance margin growth quarter analysts shares investors outlook demand supply "
+    "chip cloud software services retail consumer inflation rates federal reserve dividend buyback "
+    "valuation forecast market sector rally selloff volatility upgrade downgrade target price report "
+    "sales profit loss expansion acquisition merger regulatory antitrust lawsuit launch product users "
+    "subscribers advertising pricing costs layoffs hiring capital spending data center energy oil"
+).split()
+
+
+def words(seed, count):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(vocabulary) for _ in range(count))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, math.ceil(p * len(values)) - 1)] if values else 0.0
+
+
+class FakeServices(BaseHTTPRequestHandler):
+    """OpenAI, yfinance news and article endpoints; settings live on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def delay(self, name):
+        latency = getattr(self.server.settings, name + "_latency")
+        jitter = self.server.settings.jitter
+        time.sleep(max(0.0, latency * random.uniform(1 - jitter, 1 + jitter)))
+
+    def send(self, body, content_type="application/json", status=200):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        settings = self.server.settings
+        match = re.fullmatch(r"/news/(\w+)", self.path)
+        if match:
+            self.delay("news")
+            ticker = match.group(1)
+            base = "http://%s:%d" % self.server.server_address
+            return self.send([
+                {"title": "%s story %d" % (ticker, n), "link": "%s/articles/%s/%d" % (base, ticker, n)}
+                for n in range(settings.articles)
+            ])
+        match = re.fullmatch(r"/articles/(\w+)/(\d+)", self.path)
+        if match:
+            self.delay("article")
+            body = words(self.path, settings.article_words)
+            paragraphs = "".join("<p>%s</p>" % body[i:i + 400] for i in range(0, len(body), 400))
+            page = (
+                "<html><head><title>%s</title><script>var x = 1;</script></head><body>"
+                "<nav>Markets Sign in Subscribe</nav><div class=\"caas-body\">%s</div>"
+                "<footer>Copyright</footer></body></html>" % (self.path, paragraphs)
+            )
+            return self.send(page.encode("utf-8"), "text/html; charset=utf-8")
+        self.send({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        settings = self.server.settings
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            return self.chat(request)
+        if self.path.endswith("/audio/speech"):
+            self.delay("tts")
+            return self.send(settings.mp3, "audio/mpeg")
+        if self.path.endswith("/embeddings"):
+            self.delay("embedding")
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            data = []
+            for i, text in enumerate(inputs):
+                rng = random.Random(hashlib.sha256(str(text).encode("utf-8")).digest())
+                vector = [rng.gauss(0, 1) for _ in range(settings.embedding_dim)]
+                norm = math.sqrt(sum(v * v for v in vector))
+                vector = [v / norm for v in vector]
+                if request.get("encoding_format") == "base64":
+                    import numpy as np
+
+                    vector = base64.b64encode(np.asarray(vector, dtype="float32").tobytes()).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": vector})
+            tokens = sum(len(str(text)) // 4 + 1 for text in inputs)
+            return self.send({
+                "object": "list", "data": data, "model": request.get("model"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        self.send({"error": "not found"}, status=404)
+
+    def chat(self, request):
+        settings = self.server.settings
+        self.delay("chat")
+        model = request.get("model", "gpt-3.5-turbo-0125")
+        prompt = " ".join(str(message.get("content")) for message in request.get("messages", []))
+        prompt_tokens = len(prompt) // 4 + 1
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": model}
+
+        if request.get("tools"):
+            ticker = (re.findall(r"\b[A-Z]{2,5}\b", prompt) or ["AAPL"])[0]
+            media_format = next((f for f in ("video", "audio", "text") if f in prompt.lower()), "text")
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_fake", "type": "function", "function": {
+                    "name": request["tools"][0]["function"]["name"],
+                    "arguments": json.dumps({"media_format": media_format, "subject": ticker}),
+                },
+            }]}
+            return self.send(dict(base, object="chat.completion", choices=[
+                {"index": 0, "message": message, "finish_reason": "tool_calls"}
+            ], usage={"prompt_tokens": prompt_tokens, "completion_tokens": 20, "total_tokens": prompt_tokens + 20}))
+
+        content = words(prompt, settings.completion_words)
+        if not request.get("stream"):
+            completion_tokens = len(content) // 4 + 1
+            return self.send(dict(base, object="chat.completion", choices=[
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ], usage={
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        pieces = content.split(" ")
+        for i in range(0, len(pieces), 8):
+            delta = " ".join(pieces[i:i + 8]) + " "
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": delta}, "finish_reason": None}
+            ])
+            self.wfile.write(("data: %s\n\n" % json.dumps(chunk)).encode("utf-8"))
+            time.sleep(settings.token_interval)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class FakeTicker:
+    """yfinance.Ticker stand-in that reads news from the fake server."""
+
+    base_url = None
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    @property
+    def news(self):
+        import requests
+
+        return requests.get("%s/news/%s" % (self.base_url, self.ticker), timeout=30).json()
+
+
+class FakeAnimator:
+    """Stability Animator stand-in that writes identical frames at a set pace."""
+
+    frames = 24
+    frame_latency = 0.0
+    png = b""
+
+    def __init__(self, api_context=None, animation_prompts=None, negative_prompt=None, args=None, out_dir=None, **_):
+        self.out_dir = out_dir
+
+    def render(self):
+        for i in range(self.frames):
+            time.sleep(self.frame_latency)
+            path = os.path.join(self.out_dir, "frame_%05d.png" % i)
+            with open(path, "wb") as file:
+                file.write(self.png)
+            yield path
+
+
+def ffmpeg_bytes(run_ffmpeg, directory, name, *args):
+    path = os.path.join(directory, name)
+    run_ffmpeg(*args, path)
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def run_round(fn, items, concurrency):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            fn(*item)
+        except Exception as e:
+            with lock:
+                errors.append("%s: %s" % (type(e).__name__, e))
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, items))
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", nargs="+", default=["cli", "flask"], choices=["cli", "flask"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=16, help="requests per round")
+    parser.add_argument("--formats", nargs="+", default=["text", "audio"], choices=["text", "audio", "video"])
+    parser.add_argument("--questions", type=int, default=8, help="questions per round, 0 to skip")
+    parser.add_argument("--warm", action="store_true", help="reuse the same tickers after a warm-up pass")
+    parser.add_argument("--prefetch", action="store_true", help="prefetch each round's tickers before it runs")
+    parser.add_argument("--flask-workers", type=int, default=None, help="override [jobs] workers")
+    parser.add_argument("--chat-latency", type=float, default=0.3)
+    parser.add_argument("--token-interval", type=float, default=0.005, help="delay between streamed chunks")
+    parser.add_argument("--tts-latency", type=float, default=0.4)
+    parser.add_argument("--embedding-latency", type=float, default=0.1)
+    parser.add_argument("--news-latency", type=float, default=0.15)
+    parser.add_argument("--article-latency", type=float, default=0.1)
+    parser.add_argument("--frame-latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction")
+    parser.add_argument("--articles", type=int, default=8, help="news items per ticker")
+    parser.add_argument("--article-words", type=int, default=600)
+    parser.add_argument("--completion-words", type=int, default=250)
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--tts-seconds", type=float, default=2.0, help="audio returned per TTS call")
+    parser.add_argument("--frames", type=int, default=24)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    # Everything below must be configured before nlp reads its config.
+    home = tempfile.mkdtemp(prefix="nlp-bench-")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeServices)
+    server.daemon_threads = True
+    base_url = "http://127.0.0.1:%d" % server.server_address[1]
+    os.environ.update({
+        "NLP_HOME": home + os.sep,
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_BASE_URL": base_url + "/v1",
+        "OPENAI_API_BASE": base_url + "/v1",
+        "STABILITY_KEY": "fake",
+    })
+    import imageio_ffmpeg
+
+    bin_dir = os.path.join(home, "bin")
+    os.makedirs(bin_dir)
+    # stability_sdk's create_video_from_frames runs whatever ffmpeg is on PATH.
+    if shutil.which("ffmpeg") is None:
+        os.symlink(imageio_ffmpeg.get_ffmpeg_exe(), os.path.join(bin_dir, "ffmpeg"))
+        os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+
+    from nlp import classes, config, conversation as conversation_module
+    from nlp.metrics import metrics
+    from nlp.prefetch import Prefetcher, warm
+
+    if args.flask_workers:
+        config.set("jobs", "workers", str(args.flask_workers))
+    server.settings = SimpleNamespace(
+        chat_latency=args.chat_latency, token_interval=args.token_interval, tts_latency=args.tts_latency,
+        embedding_latency=args.embedding_latency, news_latency=args.news_latency,
+        article_latency=args.article_latency, jitter=args.jitter, articles=args.articles,
+        article_words=args.article_words, completion_words=args.completion_words,
+        embedding_dim=args.embedding_dim,
+        mp3=ffmpeg_bytes(
+            classes.run_ffmpeg, home, "fake.mp3", "-f", "lavfi", "-i", "anullsrc=r=24000:cl=mono",
+            "-t", str(args.tts_seconds), "-c:a", "libmp3lame",
+        ),
+    )
+    FakeTicker.base_url = base_url
+    FakeAnimator.frames = args.frames
+    FakeAnimator.frame_latency = args.frame_latency
+    FakeAnimator.png = ffmpeg_bytes(
+        classes.run_ffmpeg, home, "fake.png", "-f", "lavfi", "-i", "color=c=navy:s=256x256", "-frames:v", "1",
+    )
+    # classes imports both lazily, so patching the modules reaches it.
+    import stability_sdk.animation
+    import yfinance
+
+    yfinance.Ticker = FakeTicker
+    stability_sdk.animation.Animator = FakeAnimator
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    from nlp.app import app, api_context, conversation
+
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(classes.__file__)), "output")
+    # Tickers like ZABC are not in the index but still parse locally as an
+    # all-caps symbol. Their research goes to the store under NLP_HOME.
+    names = ("Z" + "".join(letters) for letters in itertools.product("ABCDEFGHIJKLMNOPQRSTUVWXYZ", repeat=3))
+    created_tickers = set()
+    job_ids = []
+    lock = threading.Lock()
+
+    def cli_request(ticker, media_format):
+        request_params = classes.Request(api_context).process_request("%s %s" % (ticker, media_format))
+        research = classes.WebScraper(request_params).scrape()
+        model = classes.Model(research, request_params, api_context)
+        if model.media_format == "text":
+            for _ in model.stream_script():
+                pass
+            content, animation_prompt = model.script, None
+        else:
+            content, animation_prompt = model.generate()
+        media = classes.Media(content, animation_prompt, request_params, api_context)
+        with lock:
+            job_ids.append(media.job_id)
+        media.generate_media()
+
+    client = app.test_client()
+
+    def flask_request(ticker, media_format):
+        response = client.post(
+            "/process", data={"ticker": ticker, "media_type": media_format}, headers={"Accept": "application/json"}
+        )
+        job_id = response.get_json()["id"]
+        with lock:
+            job_ids.append(job_id)
+        while True:
+            status = client.get("/jobs/%s" % job_id).get_json()
+            if status["status"] == "failed":
+                raise RuntimeError(status["error"])
+            if status["status"] == "done":
+                return
+            time.sleep(0.005)
+
+    def cli_question(question):
+        conversation_module.Conversation().query(question)
+
+    def flask_question(question):
+        response = client.post("/handle_question", data={"query": question})
+        if response.status_code != 200:
+            raise RuntimeError("HTTP %d" % response.status_code)
+
+    request_fns = {"cli": cli_request, "flask": flask_request}
+    question_fns = {"cli": cli_question, "flask": flask_question}
+
+    def tickers(count):
+        batch = list(itertools.islice(names, count))
+        created_tickers.update(batch)
+        return batch
+
+    results = []
+    print("fake services at %s, NLP_HOME %s" % (base_url, home))
+    warm_tickers = tickers(args.requests) if args.warm else None
+    try:
+        quiet = io.StringIO()
+        for path, concurrency in itertools.product(args.paths, args.concurrency):
+            batch = warm_tickers or tickers(args.requests)
+            items = [(ticker, args.formats[i % len(args.formats)]) for i, ticker in enumerate(batch)]
+            with contextlib.redirect_stdout(quiet), contextlib.redirect_stderr(quiet):
+                if args.warm:
+                    run_round(request_fns[path], items, concurrency)
+                if args.prefetch:
+                    Prefetcher(lambda ticker: warm(ticker, api_context, args.formats), watchlist=batch).run_once(spread=0)
+                metrics.reset()
+                latencies, errors, wall = run_round(request_fns[path], items, concurrency)
+            results.append(report(path, "pipeline", concurrency, latencies, errors, wall, metrics))
+
+        if args.questions:
+            # Questions run against an index of this run's research only.
+            conversation_module.Conversation.PERSIST_DIR = os.path.join(home, "storage")
+            with contextlib.redirect_stdout(quiet), contextlib.redirect_stderr(quiet):
+                metrics.reset()
+                latencies, errors, wall = run_round(lambda: conversation.get(), [()], 1)
+            results.append(report("-", "index build", 1, latencies, errors, wall, metrics))
+            questions = [
+                ("What did analysts say about %s margins?" % ticker,)
+                for ticker in itertools.islice(itertools.cycle(sorted(created_tickers)), args.questions)
+            ]
+            for path, concurrency in itertools.product(args.paths, args.concurrency):
+                with contextlib.redirect_stdout(quiet), contextlib.redirect_stderr(quiet):
+                    metrics.reset()
+                    latencies, errors, wall = run_round(question_fns[path], questions, concurrency)
+                results.append(report(path, "question", concurrency, latencies, errors, wall, metrics))
+    finally:
+        server.shutdown()
+        for job_id in job_ids:
+            shutil.rmtree(os.path.join(output_dir, job_id), ignore_errors=True)
+        shutil.rmtree(home, ignore_errors=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            json.dump({"args": vars(args), "results": results}, file, indent=4)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+def report(path, workload, concurrency, latencies, errors, wall, metrics):
+    stages = {}
+    for (name, labels), histogram in list(metrics.histograms.items()):
+        if name == "nlp_stage_seconds" and histogram.count:
+            stages[dict(labels)["stage"]] = histogram.sum / histogram.count
+    result = {
+        "path": path,
+        "workload": workload,
+        "concurrency": concurrency,
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "stages": stages,
+    }
+    print(
+        "%-5s %-11s c=%-3d n=%-4d err=%-3d %7.2f req/s  p50 %7.0f ms  p95 %7.0f ms  %s" % (
+            path, workload, concurrency, result["requests"], result["errors"], result["throughput"],
+            result["p50"] * 1000, result["p95"] * 1000,
+            " ".join("%s=%.0fms" % (stage, seconds * 1000) for stage, seconds in sorted(stages.items())),
+        )
+    )
+    if errors:
+        print("      first error: %s" % errors[0])
+    return result
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = {
+            (row["path"], row["workload"], row["concurrency"]): row for row in json.load(file)["results"]
+        }
+    print("\nchange against %s:" % baseline_path)
+    for row in results:
+        before = baseline.get((row["path"], row["workload"], row["concurrency"]))
+        if not before or not before["p95"] or not before["throughput"]:
+            continue
+        print("%-5s %-11s c=%-3d throughput %+6.1f%%  p50 %+6.1f%%  p95 %+6.1f%%" % (
+            row["path"], row["workload"], row["concurrency"],
+            100 * (row["throughput"] / before["throughput"] - 1),
+            100 * (row["p50"] / before["p50"] - 1) if before["p50"] else 0.0,
+            100 * (row["p95"] / before["p95"] - 1),
+        ))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
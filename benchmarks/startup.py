@@ -0,0 +1,96 @@
+"""Startup cost of each `nlp` entry point.
+
+Runs every case in a fresh interpreter and reports the median wall time of
+the whole process and of the import/dispatch step alone, plus which heavy
+backends ended up loaded. Commands should only load what they use: `nlp
+--help` needs none of them, text jobs need openai but no media or index
+libraries.
+
+    python benchmarks/startup.py [--repeat 5] [--importtime]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+heavy_modules = (
+    "numpy", "pandas", "sklearn", "openai", "yfinance", "llama_index", "moviepy", "stability_sdk", "grpc",
+)
+
+cases = {
+    "nlp --help": "from nlp.cli import main\nmain(['--help'])",
+    "nlp batch --help": "from nlp.cli import main\nmain(['batch', '--help'])",
+    "nlp chat --help": "from nlp.cli import main\nmain(['chat', '--help'])",
+    "web app": "import nlp.app",
+    "text job": (
+        "from nlp.classes import ApiContext, Model, Media, Request, WebScraper\n"
+        "ApiContext('sk-fake', 'fake', 'grpc.stability.ai:443').client"
+    ),
+    "video job": (
+        "from nlp.classes import ApiContext\n"
+        "import stability_sdk.animation, stability_sdk.utils, moviepy.editor\n"
+        "ApiContext('sk-fake', 'fake', 'grpc.stability.ai:443').stability_context"
+    ),
+    "question": "from nlp.conversation import Conversation",
+}
+
+wrapper = """
+import json, sys, time
+started = time.perf_counter()
+try:
+    exec(compile(%r, "<case>", "exec"))
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - started
+loaded = [name for name in %r if name in sys.modules]
+sys.__stdout__.write("\\n" + json.dumps([elapsed, loaded]) + "\\n")
+"""
+
+
+def run_case(code, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", wrapper % (code, heavy_modules)]
+    started = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    elapsed, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return wall, elapsed, loaded, result.stderr
+
+
+def slowest_imports(stderr, count=5):
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative), name.strip()))
+    top_level = [row for row in rows if not row[1].startswith(" ")]
+    return sorted(top_level, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest top-level imports")
+    args = parser.parse_args()
+
+    run_case("pass")  # warm the filesystem cache
+    print("%-17s %10s %10s  %s" % ("case", "process", "import", "heavy modules loaded"))
+    for name, code in cases.items():
+        runs = [run_case(code) for _ in range(args.repeat)]
+        print("%-17s %8.0fms %8.0fms  %s" % (
+            name,
+            statistics.median(run[0] for run in runs) * 1000,
+            statistics.median(run[1] for run in runs) * 1000,
+            ", ".join(runs[0][2]) or "-",
+        ))
+        if args.importtime:
+            for microseconds, module in slowest_imports(run_case(code, importtime=True)[3]):
+                print("%19s %8.0fms  %s" % ("", microseconds / 1000, module))
+
+
+if __name__ == "__main__":
+    main()
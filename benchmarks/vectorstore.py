@@ -0,0 +1,117 @@
+"""Load time, memory and query latency of the Conversation vector stores.
+
+Builds one synthetic corpus, persists it with llama_index's SimpleVectorStore
+(JSON) and with MmapVectorStore, then loads each in a fresh interpreter and
+reports the load time, the resident memory the load added, and the median
+latency of whole-corpus and single-ticker queries.
+
+    python benchmarks/vectorstore.py [--nodes 5000] [--dim 1536] [--tickers 50]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+probe = """
+import json, statistics, sys, time
+import numpy as np
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters, SimpleVectorStore, VectorStoreQuery
+from nlp.vectorstore import MmapVectorStore
+
+def rss_mb():
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+backend, path, dim, queries = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+before = rss_mb()
+started = time.perf_counter()
+if backend == "simple":
+    store = SimpleVectorStore.from_persist_path(path)
+else:
+    store = MmapVectorStore.from_persist_path(path)
+load = time.perf_counter() - started
+loaded = rss_mb()
+
+rng = np.random.default_rng(1)
+def timed(filters):
+    times = []
+    for _ in range(queries):
+        query = VectorStoreQuery(query_embedding=list(rng.normal(size=dim)), similarity_top_k=4, filters=filters)
+        started = time.perf_counter()
+        store.query(query)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+ticker = MetadataFilters(filters=[MetadataFilter(key="ticker", value="T0")])
+print(json.dumps({
+    "load": load, "rss": loaded - before, "all": timed(None), "ticker": timed(ticker), "after": rss_mb() - before,
+}))
+"""
+
+
+def build(directory, nodes, dim, tickers):
+    from llama_index.core.schema import TextNode
+    from llama_index.core.vector_stores import SimpleVectorStore
+
+    from nlp.vectorstore import MmapVectorStore
+
+    rng = np.random.default_rng(0)
+    batch = [
+        TextNode(
+            id_="n%d" % i,
+            text="",
+            embedding=rng.normal(size=dim).astype(np.float32).tolist(),
+            metadata={"ticker": "T%d" % (i % tickers), "article_id": i // 4},
+        )
+        for i in range(nodes)
+    ]
+    paths = {}
+    for backend, store in (
+        ("simple", SimpleVectorStore()),
+        ("mmap float32", MmapVectorStore()),
+        ("mmap float16", MmapVectorStore(dtype="float16")),
+    ):
+        store.add(batch)
+        path = os.path.join(directory, backend.replace(" ", "-"), "default__vector_store.json")
+        os.makedirs(os.path.dirname(path))
+        store.persist(path)
+        paths[backend] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build(directory, args.nodes, args.dim, args.tickers)
+        print("%-13s %9s %9s %11s %12s %12s" % ("store", "on disk", "load", "load RSS", "query all", "query ticker"))
+        for backend, path in paths.items():
+            size = sum(
+                os.path.getsize(os.path.join(os.path.dirname(path), name)) for name in os.listdir(os.path.dirname(path))
+            )
+            result = subprocess.run(
+                [sys.executable, "-c", probe, backend.split()[0], path, str(args.dim), str(args.queries)],
+                capture_output=True, text=True, env=env,
+            )
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip().splitlines()[-1])
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print("%-13s %7.0fMB %7.0fms %9.0fMB %10.1fms %10.1fms" % (
+                backend, size / 1e6, stats["load"] * 1000, stats["rss"], stats["all"] * 1000, stats["ticker"] * 1000,
+            ))
+
+
+if __name__ == "__main__":
+    main()
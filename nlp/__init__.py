@@ -18,6 +18,75 @@ def write_default_config(path):
 	w.write('[data]\n')
 	w.write('url = https://www.dropbox.com/s/o0nxd8pnwy809u2/headlines.csv?dl=1\n')
 	w.write('file = %s%s%s\n' % (nlp_path, os.path.sep, 'headlines.csv'))
+	w.write('[scraper]\n')
+	w.write('max_workers = 8\n')
+	w.write('timeout = 10\n')
+	w.write('max_bytes = 2097152\n')
+	w.write('[request]\n')
+	w.write('tickers = \n')
+	w.write('fuzzy_cutoff = 0.8\n')
+	w.write('max_retries = 3\n')
+	w.write('[ratelimit]\n')
+	w.write('openai_rpm = 3500\n')
+	w.write('openai_tpm = 160000\n')
+	w.write('openai_in_flight = 16\n')
+	w.write('openai.tts-1_rpm = 50\n')
+	w.write('stability_in_flight = 2\n')
+	w.write('max_retries = 5\n')
+	w.write('max_delay = 60\n')
+	w.write('[model]\n')
+	w.write('map_reduce_threshold = 12000\n')
+	w.write('chunk_tokens = 3000\n')
+	w.write('map_concurrency = 4\n')
+	w.write('token_budget = 48000\n')
+	w.write('min_words = 25\n')
+	w.write('duplicate_distance = 3\n')
+	w.write('[media]\n')
+	w.write('tts_chunk_chars = 1200\n')
+	w.write('tts_concurrency = 4\n')
+	w.write('[cache]\n')
+	w.write('article_cache = %s%s%s%s%s\n' % (nlp_path, os.path.sep, 'cache', os.path.sep, 'articles.sqlite'))
+	w.write('article_ttl = 3600\n')
+	w.write('article_cache_mb = 256\n')
+	w.write('embedding_cache = %s%s%s%s%s\n' % (nlp_path, os.path.sep, 'cache', os.path.sep, 'embeddings'))
+	w.write('completion_cache = %s%s%s%s%s\n' % (nlp_path, os.path.sep, 'cache', os.path.sep, 'completions.sqlite'))
+	w.write('completion_ttl = 21600\n')
+	w.write('completion_max_entries = 10000\n')
+	w.write('animation_cache = %s%s%s%s%s\n' % (nlp_path, os.path.sep, 'cache', os.path.sep, 'animations'))
+	w.write('animation_cache_mb = 2048\n')
+	w.write('[research]\n')
+	w.write('store = %s%s%s\n' % (nlp_path, os.path.sep, 'research.sqlite'))
+	w.write('model_hours = 48\n')
+	w.write('model_max_articles = 100\n')
+	w.write('conversation_hours = 168\n')
+	w.write('scrape_ttl = 900\n')
+	w.write('[conversation]\n')
+	w.write('hybrid = true\n')
+	w.write('similarity_top_k = 2\n')
+	w.write('vector_top_k = 10\n')
+	w.write('lexical_top_k = 50\n')
+	w.write('reuse_query_engine = true\n')
+	w.write('vector_store = mmap\n')
+	w.write('vector_dtype = float32\n')
+	w.write('[jobs]\n')
+	w.write('workers = 2\n')
+	w.write('keep = 1000\n')
+	w.write('[batch]\n')
+	w.write('scrape_workers = 8\n')
+	w.write('generate_workers = 4\n')
+	w.write('render_workers = 2\n')
+	w.write('[prefetch]\n')
+	w.write('enabled = false\n')
+	w.write('watchlist = \n')
+	w.write('top = 10\n')
+	w.write('popular_hours = 24\n')
+	w.write('interval = 600\n')
+	w.write('jitter = 0.2\n')
+	w.write('workers = 2\n')
+	w.write('formats = text\n')
+	w.write('[output]\n')
+	w.write('quota_mb = 2048\n')
+	w.write('janitor_interval = 300\n')
 	w.close()
 
 # Find NLP_HOME path
@@ -1,6 +1,12 @@
-from flask import Flask, request, jsonify, render_template
-from .classes import ApiContext, Request, WebScraper, Model, Media, Conversation
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from .classes import ApiContext, Request, WebScraper, Model, Media, SharedConversation
+from .jobs import ArtifactJanitor, JobQueue
+from .metrics import metrics
+from .prefetch import from_config as prefetcher_from_config
+from .store import ResearchStore
+from . import config
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,57 +21,174 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 STABILITY_KEY = os.getenv("STABILITY_KEY")
 STABILITY_HOST = "grpc.stability.ai:443"
 api_context = ApiContext(OPENAI_API_KEY, STABILITY_KEY, STABILITY_HOST)
+conversation = SharedConversation()
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
     if request.method == 'POST':
-        media_type = request.form['media_type']
-        return redirect(url_for('display_media', media_type=media_type))
+        return process_request()
     return render_template('index.html')
 
 from flask import Flask, request, render_template, redirect, url_for, send_from_directory
 import os
 
-@app.route('/process', methods=['POST'])
-def process_request():
-    ticker = request.form['ticker']
-    media_type = request.form['media_type']
-    request_params = (media_type, ticker)
+def normalize_ticker(ticker):
+    # One spelling per ticker, so requests share the research and scripts
+    # the prefetcher warmed.
+    return ticker.strip().lstrip('$').upper()
+
 
+def record_request(ticker):
+    # Feeds the prefetcher's list of most requested tickers.
+    store = ResearchStore.shared()
+    if store is not None:
+        store.record_request(ticker)
 
+
+def run_pipeline(job):
+    request_params = job.request_params
+    record_request(job.subject)
+
+    job.set_stage("scrape")
     web_scraper = WebScraper(request_params)
     research = web_scraper.scrape()
+
+    job.set_stage("generate")
     model = Model(research, request_params, api_context)
     content, animation_prompt = model.generate()
-    media = Media(content, animation_prompt, request_params, api_context)
-    output = media.generate_media()
 
-    
-    return redirect(url_for('display_media', media_type=media_type, file_path=output))
+    job.set_stage("render")
+    def preview(path):
+        # Playable as soon as the first TTS chunk lands, long before the
+        # full narration is stitched together.
+        job.preview = job.id + '/' + os.path.basename(path)
+
+    media = Media(content, animation_prompt, request_params, api_context, job_id=job.id, on_first_audio_chunk=preview)
+    return media.generate_media()
+
+
+job_queue = JobQueue(
+    run_pipeline,
+    max_workers=config.getint("jobs", "workers", fallback=2),
+    keep=config.getint("jobs", "keep", fallback=1000),
+)
+
+janitor = ArtifactJanitor(
+    os.path.join(BASE_DIR, 'output'),
+    max_bytes=config.getint("output", "quota_mb", fallback=2048) * 1024 * 1024,
+    interval=config.getint("output", "janitor_interval", fallback=300),
+    protect=job_queue.active,
+).start()
+
+# Refreshes popular tickers in the background so most requests find warm
+# research and cached scripts.
+prefetcher = None
+if config.getboolean("prefetch", "enabled", fallback=False):
+    prefetcher = prefetcher_from_config(api_context).start()
+
+
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+
+@app.route('/process', methods=['POST'])
+def process_request():
+    ticker = normalize_ticker(request.form['ticker'])
+    media_type = request.form['media_type']
+    request_params = (media_type, ticker)
+
+    if media_type == 'text' and not wants_json():
+        return redirect(url_for('stream_text', ticker=ticker))
+
+    job = job_queue.submit(request_params)
+
+    if wants_json():
+        return jsonify(job.to_dict()), 202
+    return render_template('display_job.html', job=job.to_dict()), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    status = job.to_dict()
+    status['preview_url'] = url_for('static', filename=job.preview) if job.preview else None
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    if job.status == "failed":
+        return jsonify(job.to_dict()), 500
+    if not job.finished:
+        return jsonify(job.to_dict()), 202
+    return redirect(url_for('display_media', media_type=job.media_format, job_id=job.id))
 
-@app.route('/display/<media_type>')
-def display_media(media_type):
-    text_dir = os.path.join(BASE_DIR, 'output')
+def sse(event, data):
+    return "event: %s\ndata: %s\n\n" % (event, json.dumps(data))
+
+@app.route('/stream/<ticker>')
+def stream_text(ticker):
+    return render_template('display_stream.html', ticker=ticker)
+
+@app.route('/stream/<ticker>/events')
+def stream_text_events(ticker):
+    ticker = normalize_ticker(ticker)
+    request_params = ('text', ticker)
+
+    def generate():
+        record_request(ticker)
+        yield sse('stage', 'scrape')
+        web_scraper = WebScraper(request_params)
+        research = web_scraper.scrape()
+
+        yield sse('stage', 'generate')
+        model = Model(research, request_params, api_context)
+        for token in model.stream_script():
+            yield sse('token', token)
+
+        media = Media(model.script, None, request_params, api_context)
+        media.generate_media()
+        yield sse('done', url_for('display_media', media_type='text', job_id=media.job_id))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/display/<media_type>/<job_id>')
+def display_media(media_type, job_id):
+    job_dir = os.path.join(BASE_DIR, 'output', job_id)
+    if len(job_id) != 32 or not os.path.isdir(job_dir):
+        return "Unknown job", 404
+    janitor.touch(job_id)
     if media_type == 'text':
-        file_path = os.path.join(text_dir, 'news.txt')
+        file_path = os.path.join(job_dir, 'news.txt')
         with open(file_path, 'r') as file:
             content = file.read()
         return render_template('display_text.html', content=content)
     elif media_type == 'audio':
-        file_path = 'speech.mp3'
+        file_path = job_id + '/speech.mp3'
         return render_template('display_audio.html', file_path=file_path)
     elif media_type == 'video':
-        file_path = 'combined_video.mp4'
+        file_path = job_id + '/combined_video.mp4'
         return render_template('display_video.html', file_path=file_path)
     else:
         return "Unsupported media type"
     
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/handle_question', methods=['POST'])
 def handle_question():
     print("Form data received:", request.form)
     query = request.form['query']
     print("Query received:", query)
-    conversation = Conversation()
     answer = conversation.query(query)
     print("Answer generated:", answer)
     return render_template('display_answer.html', answer=answer)
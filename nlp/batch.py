@@ -0,0 +1,225 @@
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+
+stages = ("scrape", "generate", "render")
+media_formats = ("text", "audio", "video")
+
+
+def read_batch_file(path, default_format="text") -> list:
+    """Read (ticker, media_format) items from a batch file.
+
+    Each line holds a ticker optionally followed by media formats, e.g.
+    ``AAPL video`` or ``MSFT text, audio``. Blank lines and ``#`` comments
+    are skipped and repeated items are dropped, keeping the file's order.
+    """
+    items = []
+    with open(path, "r", encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            words = re.split(r"[\s,]+", line.split("#", 1)[0].strip())
+            words = [word for word in words if word]
+            if not words:
+                continue
+            ticker = words[0].lstrip("$").upper()
+            formats = [word.lower() for word in words[1:]] or [default_format]
+            for media_format in formats:
+                if media_format not in media_formats:
+                    raise ValueError("line %d: unknown media format %r" % (number, media_format))
+                if (ticker, media_format) not in items:
+                    items.append((ticker, media_format))
+    return items
+
+
+class Checkpoint:
+    """Append-only JSON lines record of finished batch stages.
+
+    Only successful stages are replayed, so failed items are retried on the
+    next run. A line cut short by a crash is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.records = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("status") == "done":
+                        self.records[(record["ticker"], record["media_format"], record["stage"])] = record
+
+    def done(self, ticker, media_format, stage):
+        with self.lock:
+            return self.records.get((ticker, media_format, stage))
+
+    def record(self, **record):
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+            if record["status"] == "done":
+                self.records[(record["ticker"], record["media_format"], record["stage"])] = record
+
+
+class BatchRunner:
+    """Runs scrape, generate and render as pipelined stages over many items.
+
+    Each stage has its own worker pool, so a ticker is generated while the
+    next one is still being scraped and throughput is bounded by the slowest
+    stage rather than the sum of all three. The stage callables are
+    ``scrape(ticker) -> research_path``,
+    ``generate(ticker, media_format, research_path) -> (content, animation_prompt)``
+    and ``render(ticker, media_format, content, animation_prompt) -> output``.
+    Formats of the same ticker share one scrape.
+    """
+
+    def __init__(self, items, scrape, generate, render, checkpoint, workers=None):
+        workers = workers or {}
+        self.items = list(items)
+        self.stage_fns = {"scrape": scrape, "generate": generate, "render": render}
+        self.checkpoint = checkpoint
+        self.workers = {stage: max(1, workers.get(stage, 4)) for stage in stages}
+        self.executors = {}
+        self.scrapes = {}
+        self.timings = {stage: [] for stage in stages}
+        self.failures = []
+        self.skipped = 0
+        self.remaining = 0
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def run(self) -> dict:
+        started = time.monotonic()
+        self.executors = {
+            stage: ThreadPoolExecutor(max_workers=self.workers[stage], thread_name_prefix="batch-" + stage)
+            for stage in stages
+        }
+        self.remaining = len(self.items)
+        if not self.items:
+            self.finished.set()
+        try:
+            for item in self.items:
+                self.start(item)
+            self.finished.wait()
+        finally:
+            for executor in self.executors.values():
+                executor.shutdown(wait=True)
+        return self.summary(time.monotonic() - started)
+
+    def start(self, item):
+        ticker, media_format = item
+        if self.checkpoint.done(ticker, media_format, "render"):
+            with self.lock:
+                self.skipped += 1
+            self.complete()
+            return
+        generated = self.checkpoint.done(ticker, media_format, "generate")
+        if generated:
+            self.submit("render", item, generated["content"], generated["animation_prompt"])
+            return
+        self.scrape(ticker).add_done_callback(lambda future: self.after_scrape(item, future))
+
+    def scrape(self, ticker) -> Future:
+        with self.lock:
+            if ticker not in self.scrapes:
+                scraped = self.checkpoint.done(ticker, None, "scrape")
+                if scraped and os.path.exists(scraped["output"]):
+                    future = Future()
+                    future.set_result(scraped["output"])
+                else:
+                    future = self.executors["scrape"].submit(self.timed, "scrape", (ticker, None))
+                self.scrapes[ticker] = future
+            return self.scrapes[ticker]
+
+    def submit(self, stage, item, *args):
+        future = self.executors[stage].submit(self.timed, stage, item, *args)
+        future.add_done_callback(lambda future: self.after(stage, item, future))
+
+    def timed(self, stage, item, *args):
+        ticker, media_format = item
+        # Scrapes are shared by every format of a ticker and take the ticker only.
+        call_args = (ticker,) + args if media_format is None else (ticker, media_format) + args
+        started = time.monotonic()
+        try:
+            result = self.stage_fns[stage](*call_args)
+        except Exception as e:
+            traceback.print_exc()
+            self.checkpoint.record(
+                ticker=ticker, media_format=media_format, stage=stage, status="failed",
+                seconds=time.monotonic() - started, error=str(e),
+            )
+            raise
+        seconds = time.monotonic() - started
+        with self.lock:
+            self.timings[stage].append(seconds)
+        if stage == "generate":
+            content, animation_prompt = result
+            self.checkpoint.record(
+                ticker=ticker, media_format=media_format, stage=stage, status="done", seconds=seconds,
+                content=content, animation_prompt=animation_prompt,
+            )
+        else:
+            self.checkpoint.record(
+                ticker=ticker, media_format=media_format, stage=stage, status="done", seconds=seconds,
+                output=str(result),
+            )
+        return result
+
+    def after_scrape(self, item, future):
+        if self.fail_if_error("scrape", item, future):
+            return
+        self.submit("generate", item, future.result())
+
+    def after(self, stage, item, future):
+        if self.fail_if_error(stage, item, future):
+            return
+        if stage == "generate":
+            self.submit("render", item, *future.result())
+        else:
+            self.complete()
+
+    def fail_if_error(self, stage, item, future):
+        error = future.exception()
+        if error is None:
+            return False
+        with self.lock:
+            self.failures.append({"ticker": item[0], "media_format": item[1], "stage": stage, "error": str(error)})
+        self.complete()
+        return True
+
+    def complete(self):
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self.finished.set()
+
+    def summary(self, wall_seconds) -> dict:
+        stage_summaries = {}
+        for stage in stages:
+            timings = sorted(self.timings[stage])
+            total = sum(timings)
+            stage_summaries[stage] = {
+                "count": len(timings),
+                "workers": self.workers[stage],
+                "total_seconds": round(total, 3),
+                "mean_seconds": round(total / len(timings), 3) if timings else 0.0,
+                "p50_seconds": round(timings[len(timings) // 2], 3) if timings else 0.0,
+                "max_seconds": round(timings[-1], 3) if timings else 0.0,
+            }
+        busiest = max(stages, key=lambda stage: stage_summaries[stage]["total_seconds"] / self.workers[stage])
+        return {
+            "items": len(self.items),
+            "completed": len(self.items) - self.skipped - len(self.failures),
+            "skipped": self.skipped,
+            "failed": len(self.failures),
+            "wall_seconds": round(wall_seconds, 3),
+            "bottleneck": busiest if any(self.timings.values()) else None,
+            "stages": stage_summaries,
+            "failures": self.failures,
+        }
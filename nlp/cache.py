@@ -0,0 +1,355 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+
+class ArticleCache:
+    """On-disk cache of extracted article bodies, keyed by final URL.
+
+    Entries younger than ``ttl`` seconds are served without touching the
+    network. Older entries keep their ETag / Last-Modified validators so the
+    scraper can revalidate them with a conditional GET. The total size of the
+    cached bodies is capped at ``max_bytes`` by evicting the least recently
+    used entries.
+    """
+
+    def __init__(self, path, ttl=3600, max_bytes=256 * 1024 * 1024):
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS articles_accessed_at ON articles (accessed_at);
+            CREATE TABLE IF NOT EXISTS aliases (
+                link TEXT PRIMARY KEY,
+                url TEXT NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+
+    def get(self, link):
+        """Return the cached entry for ``link`` (or the URL it redirected to)."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT url FROM aliases WHERE link = ?", (link,)
+            ).fetchone()
+            url = row[0] if row else link
+            row = self.conn.execute(
+                "SELECT url, content, etag, last_modified, fetched_at FROM articles WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE articles SET accessed_at = ? WHERE url = ?", (now, url)
+            )
+            self.conn.commit()
+        return {
+            "url": row[0],
+            "content": row[1],
+            "etag": row[2],
+            "last_modified": row[3],
+            "fresh": now - row[4] < self.ttl,
+        }
+
+    def put(self, link, url, content, etag=None, last_modified=None):
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, content, etag, last_modified, now, now, size),
+            )
+            if link != url:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO aliases VALUES (?, ?)", (link, url)
+                )
+            self.evict()
+            self.conn.commit()
+
+    def revalidated(self, url):
+        """Mark ``url`` as fresh again after a 304 Not Modified response."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE articles SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, url),
+            )
+            self.conn.commit()
+
+    def evict(self):
+        # Caller holds self.lock.
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute(
+            "SELECT url, size FROM articles ORDER BY accessed_at"
+        ).fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM articles WHERE url = ?", (url,))
+            self.conn.execute("DELETE FROM aliases WHERE url = ?", (url,))
+            total -= size
+
+
+class EmbeddingCache:
+    """Content-addressed store of embedding vectors.
+
+    Each model gets a raw float32 matrix (``<model>.f32``), one row per
+    vector, and a JSON index (``<model>.json``) mapping the sha256 of a text
+    to its row. Rows are only ever appended, and writers serialize on a
+    ``flock`` so several processes can share one cache directory.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.lock = threading.Lock()
+        self.indexes = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def paths(self, model_name):
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        base = os.path.join(self.directory, name)
+        return base + ".f32", base + ".json", base + ".lock"
+
+    def load_index(self, model_name):
+        _, index_path, _ = self.paths(model_name)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        else:
+            index = {"dim": None, "rows": {}}
+        self.indexes[model_name] = index
+        return index
+
+    def get_many(self, model_name, texts):
+        """Return a list with the cached vector for each text, or None where missing."""
+        # numpy is only needed once embeddings are in play; keep it off the
+        # import path of the CLI and web workers.
+        import numpy as np
+
+        with self.lock:
+            index = self.indexes.get(model_name) or self.load_index(model_name)
+            keys = [self.key(text) for text in texts]
+            if any(key not in index["rows"] for key in keys):
+                # Another process may have appended since we last looked.
+                index = self.load_index(model_name)
+            rows = [index["rows"].get(key) for key in keys]
+            if index["dim"] is None or all(row is None for row in rows):
+                return [None] * len(texts)
+            data_path, _, _ = self.paths(model_name)
+            # Map only the rows the index knows about: another process may be
+            # halfway through appending past them.
+            shape = (max(index["rows"].values()) + 1, index["dim"])
+            matrix = np.memmap(data_path, dtype=np.float32, mode="r", shape=shape)
+            return [None if row is None else matrix[row].tolist() for row in rows]
+
+    def put_many(self, model_name, texts, embeddings):
+        import numpy as np
+
+        if not texts:
+            return
+        data_path, index_path, lock_path = self.paths(model_name)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self.lock, open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            index = self.load_index(model_name)
+            if index["dim"] is None:
+                index["dim"] = int(vectors.shape[1])
+            row = os.path.getsize(data_path) // (4 * index["dim"]) if os.path.exists(data_path) else 0
+            new = []
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key not in index["rows"]:
+                    index["rows"][key] = row
+                    new.append(vector)
+                    row += 1
+            if not new:
+                return
+            with open(data_path, "ab") as file:
+                file.write(np.stack(new).tobytes())
+            tmp_path = index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(index, file)
+            os.replace(tmp_path, index_path)
+
+
+class CompletionCache:
+    """SQLite cache of chat completions.
+
+    Keys are built by ``key`` from the model, the prompt and a hash of the
+    research snapshot the prompt was built from. Entries expire after
+    ``ttl`` seconds and at most ``max_entries`` are kept, evicting the least
+    recently used. Any object with the same ``get`` / ``put`` methods can be
+    used in its place.
+    """
+
+    def __init__(self, path, ttl=6 * 3600, max_entries=10000):
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at);
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(model, prompt, research_hash=""):
+        digest = hashlib.sha256()
+        for part in (model, research_hash, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.ttl:
+                self.conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.conn.commit()
+        return row[0]
+
+    def put(self, key, content):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            self.conn.execute(
+                "DELETE FROM completions WHERE created_at <= ?", (now - self.ttl,)
+            )
+            self.conn.execute(
+                """
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self.conn.commit()
+
+
+class AnimationCache:
+    """Rendered animation frames and encoded base clips, keyed by prompt and settings.
+
+    Each entry is a directory holding ``frames/`` and ``clip.mp4``; it only
+    counts as cached once ``commit`` has written its ``complete`` marker.
+    ``lock`` serializes renders of the same key across threads and
+    processes, so concurrent identical requests render once. Entries are
+    evicted least recently used first once the cache exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=10 * 1024 * 1024 * 1024):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(prompt, args):
+        prompt = " ".join(prompt.lower().split())
+        settings = json.dumps(args, sort_keys=True, default=str)
+        return hashlib.sha256((prompt + "\0" + settings).encode("utf-8")).hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.directory, key)
+
+    @contextlib.contextmanager
+    def lock(self, key, blocking=True):
+        with open(self.entry(key) + ".lock", "w") as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            fcntl.flock(lock_file, flags)
+            yield
+
+    def get(self, key):
+        """Path of the cached clip for ``key``, or None."""
+        entry = self.entry(key)
+        if not os.path.exists(os.path.join(entry, "complete")):
+            return None
+        os.utime(entry)
+        return os.path.join(entry, "clip.mp4")
+
+    def prepare(self, key):
+        """Empty entry directory to render into; call with the key's lock held."""
+        entry = self.entry(key)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.makedirs(os.path.join(entry, "frames"))
+        return entry
+
+    def commit(self, key):
+        with open(os.path.join(self.entry(key), "complete"), "w"):
+            pass
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir():
+                size = sum(
+                    os.path.getsize(os.path.join(root, name))
+                    for root, _, files in os.walk(entry.path)
+                    for name in files
+                )
+                entries.append((entry.stat().st_mtime, entry.name, size))
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                # Skip entries another worker is rendering or reading right now.
+                with self.lock(key, blocking=False):
+                    shutil.rmtree(self.entry(key), ignore_errors=True)
+            except BlockingIOError:
+                continue
+            total -= size
@@ -1,23 +1,30 @@
-from typing import Any, Text
 import os
-from openai import OpenAI
 from pathlib import Path
-from stability_sdk import api
-from stability_sdk.animation import AnimationArgs, Animator
-from stability_sdk.utils import create_video_from_frames
 from tqdm import tqdm
-from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_videoclips
-import math
+import imageio_ffmpeg
 import json
-import yfinance as yf
+import re
+import shutil
+import subprocess
+import hashlib
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from bs4 import BeautifulSoup
-from llama_index.core import (
-    VectorStoreIndex,
-    SimpleDirectoryReader,
-    StorageContext,
-    load_index_from_storage,
-)
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.compat import chardet
+
+from . import config, nlp_path
+from .cache import AnimationCache, ArticleCache, CompletionCache
+from .compaction import compact_research
+from .metrics import metrics
+from .parser import DEFAULT_TICKERS_PATH, TickerIndex
+from .ratelimit import RateLimiter, estimate_tokens
+from .store import ResearchStore
+
+chat_model = "gpt-3.5-turbo-0125"
 
 input_prompt = "What stock would you like to learn about? Please specify if you would like the information in text, audio, or video format.\n\n"
 
@@ -42,122 +49,335 @@ media_format_prompt = {
     "video": "Format this summary as the captions for an informative video. The summary should be ready to be attatched to a video with no additional text beyond what would be heard.",
 }
 
+summarize_research_prompt = "Summarize the following news articles about {}. Keep every fact, figure, date and source that bears on how the company is doing, and drop everything else. Write plain prose with no preamble."
+
 animation_prompt_generating_prompt = "Based on the following script, generate a single prompt for an animation LLM that visually represents the content. IMPORTANT: The prompt should be a single sentence that describes the general theme or concept of the script. The prompt should be clear and concise, and should not include any specific details or instructions. The animation LLM will use this prompt to generate a visual representation of the script. Make sure no words or numbers should be displayed in the animation. The animation should be engaging and visually appealing."
 
 
 class ApiContext:
     def __init__(self, openai_api_key, stability_api_key, stability_host):
         self.openai_api_key = openai_api_key
-        self.client = OpenAI(api_key=openai_api_key)
-        self.stability_context = api.Context(stability_host, stability_api_key)
+        self.stability_api_key = stability_api_key
+        self.stability_host = stability_host
+        self._client = None
+        self._stability_context = None
+        self._lock = threading.Lock()
+        self.rate_limiter = RateLimiter.shared()
+
+    @property
+    def client(self):
+        # Built on first use, so commands and jobs that never call OpenAI
+        # don't pay for importing the SDK.
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+
+                # Retries are owned by the rate limiter so they are
+                # coordinated across every thread sharing the quota.
+                self._client = OpenAI(api_key=self.openai_api_key, max_retries=0)
+            return self._client
+
+    @property
+    def stability_context(self):
+        # Only video renders need Stability; the gRPC channel is opened then.
+        with self._lock:
+            if self._stability_context is None:
+                from stability_sdk import api
+
+                self._stability_context = api.Context(self.stability_host, self.stability_api_key)
+            return self._stability_context
+
+    def call(self, provider, model, fn, /, *args, tokens=0, **kwargs):
+        """Run an API call under the provider/model's rate limits and retry policy."""
+        return self.rate_limiter.governor(provider, model).call(fn, *args, tokens=tokens, **kwargs)
+
+    def chat(self, messages, **kwargs):
+        model = kwargs.setdefault("model", chat_model)
+        estimate = sum(estimate_tokens(message["content"]) for message in messages)
+        response = self.call(
+            "openai", model, self.client.chat.completions.create, messages=messages, tokens=estimate, **kwargs
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.rate_limiter.governor("openai", model).tokens.adjust(usage.total_tokens - estimate)
+            metrics.inc("nlp_tokens_total", usage.prompt_tokens, model=model, kind="prompt")
+            metrics.inc("nlp_tokens_total", usage.completion_tokens, model=model, kind="completion")
+        return response
 
 
 class Request:
     def __init__(self, api_context: ApiContext):
-        self.client = api_context.client
-    
+        self.api_context = api_context
+        self.ticker_index = TickerIndex(
+            config.get("request", "tickers", fallback=None) or DEFAULT_TICKERS_PATH,
+            fuzzy_cutoff=config.getfloat("request", "fuzzy_cutoff", fallback=0.8),
+        )
+        self.max_retries = config.getint("request", "max_retries", fallback=3)
+
+    @metrics.timed_stage("route")
     def process_request(self, message):
-        while True:
+        parsed = self.ticker_index.parse(message)
+        if parsed:
+            media_format, subject = parsed
+            print(f"Here is the {media_format} information on {subject}.")
+            return [media_format, subject]
+
+        for attempt in range(self.max_retries):
             try:
                 messages = [{"role": "user", "content": message}]
                 tools = [conversation_function]
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo-0125",
-                    messages=messages,
+                response = self.api_context.chat(
+                    messages,
                     tools=tools,
                     tool_choice="auto",
                 )
 
                 response_message = response.choices[0].message
+                if not response_message.tool_calls:
+                    # The model answered in prose instead of calling the
+                    # tool, so asking it the same thing again won't help.
+                    break
                 tool_call = response_message.tool_calls[0]
                 arguments = json.loads(tool_call.function.arguments)
 
                 media_format = arguments["media_format"]
                 subject = arguments["subject"]
+                subject = self.ticker_index.lookup(subject) or subject
 
                 print(f"Here is the {media_format} information on {subject}.")
                 return [media_format, subject]
 
             except Exception as e:
                 print(e)
-                print(
-                    "Sorry, I didn't understand that. Please try again and clearly specify the ticker and the desired media format output."
-                )
-            
+                time.sleep(0.5 * 2 ** attempt)
+
+        print(
+            "Sorry, I didn't understand that. Please try again and clearly specify the ticker and the desired media format output."
+        )
+        return None
 
-            
-    
     def route_request(self):
-        return self.process_request(input(input_prompt))
+        request_params = None
+        while request_params is None:
+            request_params = self.process_request(input(input_prompt))
+        return request_params
+
+
+try:
+    import lxml  # noqa: F401
+
+    html_parser = "lxml"
+except ImportError:
+    html_parser = "html.parser"
+
+
+def is_article_tag(name, attrs):
+    if name == "article":
+        return True
+    if name != "div":
+        return False
+    classes = attrs.get("class") or ""
+    if isinstance(classes, str):
+        classes = classes.split()
+    return "caas-body" in classes
+
+
+article_strainer = SoupStrainer(is_article_tag)
 
 
 class WebScraper:
+    _session = None
+    _session_lock = threading.Lock()
+    _cache = None
+
     def __init__(self, request_params: list):
         self.subject = request_params[1]
+        self.max_workers = max(1, config.getint("scraper", "max_workers", fallback=8))
+        self.timeout = config.getfloat("scraper", "timeout", fallback=10.0)
+        self.max_bytes = config.getint("scraper", "max_bytes", fallback=2 * 1024 * 1024)
+        self.session = self.get_session()
+        self.cache = self.get_cache()
         self.base_dir = Path(__file__).parent
         self.research_dir = self.base_dir / "research"
         self.research_dir.mkdir(exist_ok=True)
 
-    def get_news_articles(self, ticker):
-        articles_list = []
-        stock = yf.Ticker(ticker)
-        news_items = stock.news
-
-        for item in news_items:
-            url = item["link"]
-            try:
-                response = requests.get(
-                    url, headers={"User-Agent": "Mozilla/5.0"}, allow_redirects=True
+    @classmethod
+    def get_session(cls):
+        # One keep-alive session for the whole process; urllib3 keeps a
+        # connection pool per host underneath it.
+        with cls._session_lock:
+            if cls._session is None:
+                pool_size = config.getint("scraper", "max_workers", fallback=8)
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=pool_size, pool_maxsize=pool_size
+                )
+                session = requests.Session()
+                session.headers.update({"User-Agent": "Mozilla/5.0"})
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def get_cache(cls):
+        path = config.get(
+            "cache", "article_cache", fallback=os.path.join(nlp_path, "cache", "articles.sqlite")
+        )
+        if not path:
+            return None
+        with cls._session_lock:
+            if cls._cache is None:
+                cls._cache = ArticleCache(
+                    path,
+                    ttl=config.getint("cache", "article_ttl", fallback=3600),
+                    max_bytes=config.getint("cache", "article_cache_mb", fallback=256) * 1024 * 1024,
+                )
+            return cls._cache
+
+    def fetch_article(self, item):
+        url = item["link"]
+        cached = self.cache.get(url) if self.cache else None
+        if cached and cached["fresh"]:
+            metrics.inc("nlp_cache_requests_total", cache="article", result="hit")
+            return {"title": item["title"], "url": cached["url"], "content": cached["content"]}
+
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            with metrics.call("http", "article"):
+                response = self.session.get(
+                    url, headers=headers, allow_redirects=True, timeout=self.timeout, stream=True
                 )
+            with response:
                 final_url = response.url
+                if response.status_code == 304 and cached:
+                    metrics.inc("nlp_cache_requests_total", cache="article", result="revalidated")
+                    self.cache.revalidated(cached["url"])
+                    return {"title": item["title"], "url": cached["url"], "content": cached["content"]}
+                if self.cache:
+                    metrics.inc("nlp_cache_requests_total", cache="article", result="miss")
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    article_content = soup.find(
-                        "div", {"class": "caas-body"}
-                    ) or soup.find("article")
-                    if article_content:
-                        articles_list.append(
-                            {
-                                "title": item["title"],
-                                "url": final_url,
-                                "content": article_content.text,
-                            }
+                    content = self.extract_content(self.read_capped(response))
+            if response.status_code == 200:
+                if content is not None:
+                    if self.cache:
+                        self.cache.put(
+                            url,
+                            final_url,
+                            content,
+                            etag=response.headers.get("ETag"),
+                            last_modified=response.headers.get("Last-Modified"),
                         )
-                    else:
-                        articles_list.append(
-                            {
-                                "title": item["title"],
-                                "url": final_url,
-                                "content": "Content not found - page may use dynamic loading or have a different layout",
-                            }
-                        )
-                else:
-                    articles_list.append(
-                        {
-                            "title": item["title"],
-                            "url": final_url,
-                            "content": f"Failed to fetch article: HTTP {response.status_code}",
-                        }
-                    )
-            except requests.exceptions.RequestException as e:
-                articles_list.append(
-                    {
+                    return {
                         "title": item["title"],
-                        "url": url,
-                        "content": f"Error fetching the article: {str(e)}",
+                        "url": final_url,
+                        "content": content,
                     }
-                )
+                return {
+                    "title": item["title"],
+                    "url": final_url,
+                    "content": "Content not found - page may use dynamic loading or have a different layout",
+                }
+            return {
+                "title": item["title"],
+                "url": final_url,
+                "content": f"Failed to fetch article: HTTP {response.status_code}",
+            }
+        except requests.exceptions.RequestException as e:
+            return {
+                "title": item["title"],
+                "url": url,
+                "content": f"Error fetching the article: {str(e)}",
+            }
+
+    def read_capped(self, response) -> str:
+        """Decode at most max_bytes of a streamed response, the way response.text would."""
+        body = bytearray()
+        for block in response.iter_content(64 * 1024):
+            body += block
+            if len(body) >= self.max_bytes:
+                break
+        body = bytes(body[:self.max_bytes])
+        encoding = response.encoding or chardet.detect(body)["encoding"] or "utf-8"
+        try:
+            return body.decode(encoding, errors="replace")
+        except LookupError:
+            return body.decode("utf-8", errors="replace")
+
+    @staticmethod
+    def extract_content(html):
+        """Text of the page's div.caas-body, else its first <article>, else None.
+
+        Only those subtrees are built, so most of the page is tokenized but
+        never turned into Python objects.
+        """
+        soup = BeautifulSoup(html, html_parser, parse_only=article_strainer)
+        article_content = soup.find(
+            "div", {"class": "caas-body"}
+        ) or soup.find("article")
+        return article_content.text if article_content else None
 
-        return articles_list
+    def get_news_articles(self, ticker):
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        with metrics.call("yfinance", "news"):
+            news_items = stock.news
+
+        # executor.map keeps the yfinance ordering of the news items.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            articles = list(executor.map(self.fetch_article, news_items))
+        for item, article in zip(news_items, articles):
+            article["published_at"] = item.get("providerPublishTime")
+        return articles
 
     @staticmethod
     def save_to_json(data, path):
-        with open(path, "w", encoding="utf-8") as file:
+        # Write to a private (hidden) temp file and rename it into place so
+        # concurrent scrapes of the same ticker never leave a half-written
+        # file behind for Model or the Conversation index to read.
+        directory, name = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
             json.dump(data, file, ensure_ascii=False, indent=4)
-
-    def scrape(self):
+        os.replace(tmp_path, path)
+
+    def fresh_research(self, max_age):
+        """Research for the subject scraped within ``max_age`` seconds, or None."""
+        store = ResearchStore.shared()
+        if store is not None:
+            scraped_at = store.last_scraped(self.subject)
+            path = Path(store.path)
+        else:
+            path = self.research_dir / f"{self.subject}.json"
+            scraped_at = path.stat().st_mtime if path.exists() else None
+        if scraped_at is not None and time.time() - scraped_at < max_age:
+            return path
+        return None
+
+    @metrics.timed_stage("scrape")
+    def scrape(self, max_age=None):
+        """Scrape the subject's news, unless research younger than ``max_age`` exists.
+
+        ``max_age`` defaults to ``[research] scrape_ttl`` seconds; 0 always scrapes.
+        """
         ticker = self.subject
+        if max_age is None:
+            max_age = config.getfloat("research", "scrape_ttl", fallback=900)
+        if max_age > 0:
+            research = self.fresh_research(max_age)
+            metrics.inc("nlp_cache_requests_total", cache="research", result="miss" if research is None else "hit")
+            if research is not None:
+                return research
         news_articles = self.get_news_articles(ticker)
+        store = ResearchStore.shared()
+        if store is not None:
+            store.save(ticker, news_articles)
+            print("News articles saved to the research store.")
+            return Path(store.path)
         research_path = self.research_dir / f"{ticker}.json"
         self.save_to_json(news_articles, research_path)
         print("News articles saved to JSON.")
@@ -165,45 +385,205 @@ class WebScraper:
 
 
 class Model:
-    def __init__(self, research: str, request_params: list, api_context: ApiContext):
-        with open(research, "r", encoding="utf-8") as file:
-            self.research = file.read()
-            self.subject = request_params[1]
-            self.media_format = request_params[0]
+    _completion_cache = None
+    _completion_cache_lock = threading.Lock()
 
-        self.request = request_params
-        self.client = api_context.client
+    def __init__(self, research: str, request_params: list, api_context: ApiContext, completion_cache=None):
+        self.subject = request_params[1]
+        self.media_format = request_params[0]
+        self.research = self.load_research(research)
 
-    def generate_script(self) -> str:
+        self.request = request_params
+        self.api_context = api_context
+        self.research_hash = hashlib.sha256(self.research.encode("utf-8")).hexdigest()
+        self.completion_cache = completion_cache or self.get_completion_cache()
+        self.script = None
+        self.condensed_research = None
+        self.map_reduce_threshold = config.getint("model", "map_reduce_threshold", fallback=12000)
+        self.chunk_tokens = config.getint("model", "chunk_tokens", fallback=3000)
+        self.map_concurrency = max(1, config.getint("model", "map_concurrency", fallback=4))
+
+    def load_research(self, research) -> str:
+        """Compacted research for the subject, from the research store or a JSON file."""
+        if ResearchStore.is_store(research):
+            store = ResearchStore.shared()
+            if store is None or os.path.abspath(store.path) != os.path.abspath(research):
+                store = ResearchStore(research)
+            # One indexed query for this ticker's recent window, however
+            # much history the store holds.
+            limit = config.getint("research", "model_max_articles", fallback=100)
+            articles = store.recent(
+                self.subject,
+                hours=config.getfloat("research", "model_hours", fallback=48),
+                limit=limit,
+            )
+            if not articles:
+                # Nothing published inside the window (a quiet ticker), so
+                # use whatever the latest scrape found rather than nothing.
+                articles = store.latest_scrape(self.subject, limit=limit)
+            return self.compact_articles(articles)
+        with open(research, "r", encoding="utf-8") as file:
+            return self.compact(file.read())
+
+    @classmethod
+    def compact(cls, research) -> str:
+        try:
+            articles = json.loads(research)
+        except json.JSONDecodeError:
+            return research
+        if not isinstance(articles, list):
+            return research
+        return cls.compact_articles(articles)
 
-        message_subject = "Based on the following reasearch articles, summarize if {} is doing well.".format(self.subject)
-        message_format = media_format_prompt[self.media_format]
+    @staticmethod
+    def compact_articles(articles) -> str:
+        articles = compact_research(
+            articles,
+            token_budget=config.getint("model", "token_budget", fallback=48000),
+            min_words=config.getint("model", "min_words", fallback=25),
+            max_distance=config.getint("model", "duplicate_distance", fallback=3),
+        )
+        return json.dumps(articles, ensure_ascii=False, indent=4)
 
-        message_thread = (
-            message_subject + message_format + "\n###\n" + self.research + "\n###"
+    @classmethod
+    def get_completion_cache(cls):
+        path = config.get(
+            "cache", "completion_cache", fallback=os.path.join(nlp_path, "cache", "completions.sqlite")
         )
+        if not path:
+            return None
+        with cls._completion_cache_lock:
+            if cls._completion_cache is None:
+                cls._completion_cache = CompletionCache(
+                    path,
+                    ttl=config.getint("cache", "completion_ttl", fallback=6 * 3600),
+                    max_entries=config.getint("cache", "completion_max_entries", fallback=10000),
+                )
+            return cls._completion_cache
+
+    def complete(self, message_thread) -> str:
+        key = CompletionCache.key(chat_model, message_thread, self.research_hash)
+        if self.completion_cache:
+            content = self.completion_cache.get(key)
+            metrics.inc("nlp_cache_requests_total", cache="completion", result="miss" if content is None else "hit")
+            if content is not None:
+                return content
+
         messages = [{"role": "system", "content": message_thread}]
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=messages,
-        )
+        response = self.api_context.chat(messages)
         content = response.choices[0].message.content
+        if self.completion_cache:
+            self.completion_cache.put(key, content)
         return content
 
+    def stream_complete(self, message_thread):
+        """Like complete, but yields the content piece by piece as it arrives."""
+        key = CompletionCache.key(chat_model, message_thread, self.research_hash)
+        if self.completion_cache:
+            content = self.completion_cache.get(key)
+            metrics.inc("nlp_cache_requests_total", cache="completion", result="miss" if content is None else "hit")
+            if content is not None:
+                yield content
+                return
+
+        messages = [{"role": "system", "content": message_thread}]
+        stream = self.api_context.chat(messages, stream=True)
+        parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        if self.completion_cache:
+            self.completion_cache.put(key, "".join(parts))
+
+    def research_chunks(self, research) -> list:
+        """Split research into pieces of roughly chunk_tokens, on article boundaries."""
+        try:
+            articles = json.loads(research)
+        except json.JSONDecodeError:
+            articles = None
+        if isinstance(articles, list):
+            pieces = [json.dumps(article, ensure_ascii=False) for article in articles]
+        else:
+            pieces = research.split("\n\n")
+
+        chunk_chars = self.chunk_tokens * 4
+        chunks, current, size = [], [], 0
+        for piece in pieces:
+            # A single article longer than a chunk is cut into chunk-sized parts.
+            for start in range(0, max(len(piece), 1), chunk_chars):
+                part = piece[start:start + chunk_chars]
+                tokens = estimate_tokens(part)
+                if current and size + tokens > self.chunk_tokens:
+                    chunks.append("\n\n".join(current))
+                    current, size = [], 0
+                current.append(part)
+                size += tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        return chunks
+
+    def summarize_chunk(self, chunk) -> str:
+        message_thread = summarize_research_prompt.format(self.subject) + "\n###\n" + chunk + "\n###"
+        return self.complete(message_thread)
+
+    def condense_research(self) -> str:
+        """Research small enough for one prompt, map-reduced through summaries if needed."""
+        if self.condensed_research is not None:
+            return self.condensed_research
+
+        research = self.research
+        while estimate_tokens(research) > self.map_reduce_threshold:
+            chunks = self.research_chunks(research)
+            with ThreadPoolExecutor(max_workers=self.map_concurrency) as executor:
+                summaries = list(executor.map(self.summarize_chunk, chunks))
+            condensed = "\n\n".join(summaries)
+            if len(chunks) == 1 or len(condensed) >= len(research):
+                # Summaries stopped shrinking; send the shorter of the two.
+                research = min(research, condensed, key=len)
+                break
+            research = condensed
+
+        self.condensed_research = research
+        return research
+
+    def script_prompt(self) -> str:
+        message_subject = "Based on the following reasearch articles, summarize if {} is doing well.".format(self.subject)
+        message_format = media_format_prompt[self.media_format]
+
+        return message_subject + message_format + "\n###\n" + self.condense_research() + "\n###"
+
+    def generate_script(self) -> str:
+        if self.script is None:
+            self.script = self.complete(self.script_prompt())
+        return self.script
+
+    def stream_script(self):
+        """Yield the script as it is generated; self.script holds it once done."""
+        if self.script is not None:
+            yield self.script
+            return
+
+        parts = []
+        with metrics.stage("generate"):
+            for part in self.stream_complete(self.script_prompt()):
+                parts.append(part)
+                yield part
+        self.script = "".join(parts)
+
     def generate_animation_prompt(self) -> str:
         animation_script = self.generate_script()
 
         message_thread = (
             animation_prompt_generating_prompt + "\n###\n" + animation_script + "\n###"
         )
-        messages = [{"role": "system", "content": message_thread}]
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=messages,
-        )
-        animation_prompt = response.choices[0].message.content
+        animation_prompt = self.complete(message_thread)
         return [animation_script, animation_prompt]
 
+    @metrics.timed_stage("generate")
     def generate(self) -> list:
         if self.media_format == "text":
             return [self.generate_script(), None]
@@ -215,67 +595,243 @@ class Model:
             return self.generate_animation_prompt()
 
 
+def run_ffmpeg(*args):
+    subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error", *args],
+        check=True,
+    )
+
+
 class Media:
+    _animation_cache = None
+    _animation_cache_lock = threading.Lock()
+
     def __init__(
-        self, content, animation_prompt, request_params: list, api_context: ApiContext
+        self, content, animation_prompt, request_params: list, api_context: ApiContext, job_id=None,
+        on_first_audio_chunk=None,
     ):
         self.media_format = request_params[0]
         self.base_dir = Path(__file__).parent
-        self.output_dir = self.base_dir / "output"
+        # Every job renders into its own directory so concurrent jobs never
+        # overwrite each other's artifacts.
+        self.job_id = job_id or uuid.uuid4().hex
+        self.output_dir = self.base_dir / "output" / self.job_id
         self.output_dir.mkdir(
-            exist_ok=True
-        ) 
-        self.client = api_context.client
-        self.stability_context = api_context.stability_context
+            parents=True, exist_ok=True
+        )
+        self.api_context = api_context
         self.content = content
         self.animation_prompt = animation_prompt
+        self.on_first_audio_chunk = on_first_audio_chunk
+        self.tts_chunk_chars = config.getint("media", "tts_chunk_chars", fallback=1200)
+        self.tts_concurrency = max(1, config.getint("media", "tts_concurrency", fallback=4))
+        self.animation_cache = self.get_animation_cache()
 
-    def generate_audio(self):
-        speech_file_path = self.output_dir / "speech.mp3"
-        response = self.client.audio.speech.create(
+    @staticmethod
+    def split_script(text, max_chars) -> list:
+        """Split text into chunks of at most max_chars, on paragraph then sentence boundaries."""
+        # (paragraph number, text) so pieces of one paragraph rejoin with a space.
+        pieces = []
+        for number, paragraph in enumerate(re.split(r"\n\s*\n", text.strip())):
+            paragraph = paragraph.strip()
+            if len(paragraph) <= max_chars:
+                pieces.append((number, paragraph))
+                continue
+            for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+                while len(sentence) > max_chars:
+                    cut = sentence.rfind(" ", 0, max_chars)
+                    cut = cut if cut > 0 else max_chars
+                    pieces.append((number, sentence[:cut]))
+                    sentence = sentence[cut:].lstrip()
+                pieces.append((number, sentence))
+
+        chunks = []
+        last_paragraph = None
+        for number, piece in pieces:
+            if not piece:
+                continue
+            separator = " " if number == last_paragraph else "\n\n"
+            if chunks and len(chunks[-1]) + len(separator) + len(piece) <= max_chars:
+                chunks[-1] += separator + piece
+            else:
+                chunks.append(piece)
+            last_paragraph = number
+        return chunks or [text]
+
+    def synthesize_speech(self, text, path):
+        response = self.api_context.call(
+            "openai",
+            "tts-1",
+            self.api_context.client.audio.speech.create,
             model="tts-1",
             voice="onyx",
-            input=self.content,
+            input=text,
         )
-        response.stream_to_file(str(speech_file_path))
-        return speech_file_path
+        # TTS is billed per input character rather than per token.
+        metrics.inc("nlp_tokens_total", len(text), model="tts-1", kind="characters")
+        response.stream_to_file(str(path))
+        return path
 
-    def generate_frames(self):
-        frames_dir = self.output_dir / "video_frames"
-        frames_dir.mkdir(exist_ok=True)
-        args = AnimationArgs()
+    @staticmethod
+    def concatenate_mp3(paths, output_path):
+        """Join MP3 files without re-encoding."""
+        list_path = Path(output_path).with_suffix(".txt")
+        list_path.write_text("".join("file '%s'\n" % Path(path).resolve() for path in paths))
+        try:
+            run_ffmpeg(
+                "-f", "concat", "-safe", "0", "-i", str(list_path),
+                "-c", "copy", str(output_path),
+            )
+        except (OSError, RuntimeError, subprocess.CalledProcessError):
+            # MP3 frames are self-contained, so plain byte concatenation
+            # (minus each part's ID3 tag) still plays back seamlessly.
+            with open(output_path, "wb") as output:
+                for i, path in enumerate(paths):
+                    data = Path(path).read_bytes()
+                    if i and data[:3] == b"ID3":
+                        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+                        data = data[10 + size:]
+                    output.write(data)
+        finally:
+            list_path.unlink(missing_ok=True)
+        return output_path
+
+    def generate_audio(self):
+        speech_file_path = self.output_dir / "speech.mp3"
+        chunks = self.split_script(self.content, self.tts_chunk_chars)
+        if len(chunks) == 1:
+            return self.synthesize_speech(self.content, speech_file_path)
+
+        with ThreadPoolExecutor(max_workers=self.tts_concurrency) as executor:
+            futures = [
+                executor.submit(self.synthesize_speech, chunk, self.output_dir / f"speech_{i:03d}.mp3")
+                for i, chunk in enumerate(chunks)
+            ]
+            first_chunk = futures[0].result()
+            if self.on_first_audio_chunk:
+                self.on_first_audio_chunk(first_chunk)
+            paths = [future.result() for future in futures]
+        return self.concatenate_mp3(paths, speech_file_path)
+
+    @classmethod
+    def get_animation_cache(cls):
+        path = config.get(
+            "cache", "animation_cache", fallback=os.path.join(nlp_path, "cache", "animations")
+        )
+        if not path:
+            return None
+        with cls._animation_cache_lock:
+            if cls._animation_cache is None:
+                cls._animation_cache = AnimationCache(
+                    path,
+                    max_bytes=config.getint("cache", "animation_cache_mb", fallback=2048) * 1024 * 1024,
+                )
+            return cls._animation_cache
+
+    def generate_frames(self, frames_dir, args=None):
+        from stability_sdk.animation import AnimationArgs, Animator
+
+        args = args or AnimationArgs()
+        frames_dir = Path(frames_dir)
+        frames_dir.mkdir(parents=True, exist_ok=True)
         animation_prompts = {
             0: self.animation_prompt,
         }
         negative_prompt = ""
         animator = Animator(
-            api_context=self.stability_context,
+            api_context=self.api_context.stability_context,
             animation_prompts=animation_prompts,
             negative_prompt=negative_prompt,
             args=args,
             out_dir=str(frames_dir),
         )
-        for _ in tqdm(animator.render(), total=args.max_frames):
-            pass
+
+        def render():
+            for _ in tqdm(animator.render(), total=args.max_frames):
+                pass
+
+        self.api_context.call("stability", "animation", render)
         return frames_dir
 
+    def generate_video_clip(self, fps=24):
+        """Render the animation and encode it into the job's ``video.mp4``.
+
+        With the animation cache enabled, identical prompt and settings reuse
+        the frames and clip from an earlier job; concurrent jobs for the same
+        key wait for the first render instead of starting their own.
+        """
+        from stability_sdk.animation import AnimationArgs, args_to_dict
+        from stability_sdk.utils import create_video_from_frames
+
+        video_path = self.output_dir / "video.mp4"
+        args = AnimationArgs()
+        if self.animation_cache is None:
+            frames_dir = self.generate_frames(self.output_dir / "frames", args)
+            create_video_from_frames(str(frames_dir), str(video_path), fps=fps)
+            return video_path
+
+        settings = args_to_dict(args)
+        # The parameter name is a per-instance counter, not a setting.
+        settings.pop("name", None)
+        settings["fps"] = fps
+        key = self.animation_cache.key(self.animation_prompt, settings)
+        with self.animation_cache.lock(key):
+            clip_path = self.animation_cache.get(key)
+            metrics.inc("nlp_cache_requests_total", cache="animation", result="miss" if clip_path is None else "hit")
+            if clip_path is None:
+                entry = Path(self.animation_cache.prepare(key))
+                frames_dir = self.generate_frames(entry / "frames", args)
+                create_video_from_frames(str(frames_dir), str(entry / "clip.mp4"), fps=fps)
+                self.animation_cache.commit(key)
+                clip_path = self.animation_cache.get(key)
+            # Link the clip into the job directory while the entry is locked,
+            # so eviction cannot remove it underneath the mux.
+            try:
+                os.link(clip_path, video_path)
+            except OSError:
+                shutil.copyfile(clip_path, video_path)
+        return video_path
+
     def combine_audio_video(self, audio_path, video_path, output_filename):
+        output_path = self.output_dir / output_filename
 
-        video_clip = VideoFileClip(str(video_path))
-        audio_clip = AudioFileClip(str(audio_path))
+        # Loop the rendered clip and mux the narration in without touching
+        # the video stream; the MP3 is copied too when the muxer accepts it.
+        for audio_codec in ("copy", "aac"):
+            try:
+                run_ffmpeg(
+                    "-stream_loop", "-1", "-i", str(video_path),
+                    "-i", str(audio_path),
+                    "-map", "0:v:0", "-map", "1:a:0",
+                    "-c:v", "copy", "-c:a", audio_codec,
+                    "-shortest", "-movflags", "+faststart",
+                    str(output_path),
+                )
+                return output_path
+            except (OSError, RuntimeError, subprocess.CalledProcessError):
+                continue
 
+        # Fall back to a single streaming encode; loop() is lazy, so the
+        # clip is never materialized loop_count times in memory.
+        from moviepy.editor import AudioFileClip, VideoFileClip
 
-        loop_count = math.ceil(audio_clip.duration / video_clip.duration)
+        video_clip = VideoFileClip(str(video_path))
+        audio_clip = AudioFileClip(str(audio_path))
 
-        looped_video_clip = concatenate_videoclips([video_clip] * loop_count)
+        looped_video_clip = video_clip.loop(duration=audio_clip.duration)
 
         final_clip = looped_video_clip.set_audio(audio_clip)
 
-        output_path = self.output_dir / output_filename
-        final_clip.write_videofile(output_filename, codec="libx264", audio_codec="aac")
+        final_clip.write_videofile(
+            str(output_path),
+            codec="libx264",
+            audio_codec="aac",
+            temp_audiofile=str(output_path.with_suffix(".temp_audio.m4a")),
+        )
 
         return output_path
 
+    @metrics.timed_stage("render")
     def generate_media(self):
         if self.media_format == "text":
             text_path = self.output_dir / "news.txt"
@@ -290,10 +846,7 @@ class Media:
         if self.media_format == "video":
             audio_path = self.generate_audio()
 
-            video_path = self.output_dir / "video.mp4"
-            # frames_dir = self.generate_frames()
-            frames_dir = self.output_dir / "video_frames"
-            create_video_from_frames(frames_dir, str(video_path), fps=24)
+            video_path = self.generate_video_clip()
 
             output_path = self.output_dir / "combined_video.mp4"
 
@@ -302,25 +855,69 @@ class Media:
             )
 
 
-class Conversation:
-    def __init__(self) -> None:      
-        self.BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        self.PERSIST_DIR = os.path.join(self.BASE_DIR, "storage")
-        self.RESEARCH_DIR = os.path.join(self.BASE_DIR, "research")
+class SharedConversation:
+    """Process-wide Conversation that is only reloaded when the index or research on disk changes.
+
+    The first question waits for the index to load. After that, a change on
+    disk starts a rebuild on a background thread and questions keep going to
+    the current index until the new one is swapped in.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.conversation = None
+        self.version = None
+        self.reloader = None
+
+    def build(self):
+        from .conversation import Conversation
+
+        # A fresh Conversation applies any pending research changes
+        # incrementally, so the live index is never mutated in place.
+        conversation = Conversation()
+        version = Conversation.version()
+        with self.lock:
+            self.conversation = conversation
+            self.version = version
+
+    def reload(self):
+        try:
+            with self.build_lock:
+                self.build()
+        except Exception:
+            # Keep serving the old index; the next question retries.
+            traceback.print_exc()
+        finally:
+            with self.lock:
+                self.reloader = None
+
+    def get(self):
+        from .conversation import Conversation
+
+        version = Conversation.version()
+        with self.lock:
+            if self.conversation is not None:
+                if version != self.version and self.reloader is None:
+                    self.reloader = threading.Thread(target=self.reload, name="conversation-reload", daemon=True)
+                    self.reloader.start()
+                return self.conversation
+        with self.build_lock:
+            if self.conversation is None:
+                self.build()
+            return self.conversation
 
-        if not os.path.exists(self.PERSIST_DIR):
-            self.documents = SimpleDirectoryReader(self.RESEARCH_DIR).load_data()
-            self.index = VectorStoreIndex.from_documents(self.documents)
-
-            self.index.storage_context.persist(persist_dir=self.PERSIST_DIR)
-        else:
-
-            self.storage_context = StorageContext.from_defaults(persist_dir=self.PERSIST_DIR)
-            self.index = load_index_from_storage(self.storage_context)
+    def query(self, query):
+        # Queries run outside the lock on whichever index was current, so a
+        # reload never blocks or invalidates an in-flight question.
+        return self.get().query(query)
 
 
-    def query(self, query):
-        query_engine = self.index.as_query_engine()
-        response = query_engine.query(query)
-        return response
+def __getattr__(name):
+    # Conversation pulls in llama_index, so it lives in its own module and
+    # is only imported when something asks for it.
+    if name in ("CachedEmbedding", "Conversation"):
+        from . import conversation
 
+        return getattr(conversation, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -2,28 +2,31 @@
 
 """Demonstrating a very simple NLP project. Yours should be more exciting than this."""
 import click
-import glob
-import pickle
 import sys
 import json
-import numpy as np
-import pandas as pd
-import re
-import requests
 from dotenv import load_dotenv
 import os
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import StratifiedKFold
-from sklearn.metrics import accuracy_score, classification_report
 
 from . import clf_path, config
-from .classes import ApiContext, Request, WebScraper, Model, Media, Conversation
+from .metrics import metrics
+
+# Pipeline classes are imported inside each command so `nlp --help` and
+# commands that never touch them don't pay for their dependencies.
 
 
 @click.group()
-def main(args=None):
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="write a JSON trace of stage and API call timings to this file",
+)
+@click.pass_context
+def main(ctx, trace=None, args=None):
     """Console script for nlp."""
+    if trace:
+        metrics.tracing = True
+        ctx.call_on_close(lambda: metrics.dump_trace(trace))
     return 0
 
 
@@ -50,6 +53,8 @@ def chat():
     """
     Chat with the a chatgpt instance.
     """
+    from .classes import ApiContext, Request, WebScraper, Model, Media
+    from .conversation import Conversation
 
     load_dotenv()
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -69,7 +74,13 @@ def chat():
     research = web_scraper.scrape()
 
     model = Model(research, request_params, api)
-    [content, animation_prompt] = model.generate()
+    if model.media_format == "text":
+        for token in model.stream_script():
+            print(token, end="", flush=True)
+        print()
+        [content, animation_prompt] = [model.script, None]
+    else:
+        [content, animation_prompt] = model.generate()
 
     media = Media(content, animation_prompt, request_params, api)
     output = media.generate_media()
@@ -81,11 +92,129 @@ def chat():
     print(answer)
 
 
+@main.command("batch")
+@click.argument("tickers_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-f",
+    "--format",
+    "media_format",
+    default="text",
+    show_default=True,
+    type=click.Choice(["text", "audio", "video"]),
+    help="media format for tickers that do not name one",
+)
+@click.option("--checkpoint", default=None, help="progress file [default: TICKERS_FILE.checkpoint.jsonl]")
+@click.option("--summary", default=None, help="summary file [default: TICKERS_FILE.summary.json]")
+@click.option("--restart", is_flag=True, help="ignore progress from an earlier run")
+def batch(tickers_file, media_format, checkpoint, summary, restart):
+    """
+    Generate briefings for every ticker in TICKERS_FILE.
+    """
+    from .batch import BatchRunner, Checkpoint, read_batch_file
+    from .classes import ApiContext, WebScraper, Model, Media
+
+    load_dotenv()
+    api = ApiContext(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        stability_api_key=os.getenv("STABILITY_KEY"),
+        stability_host="grpc.stability.ai:443",
+    )
+
+    def scrape(ticker):
+        return WebScraper(["text", ticker]).scrape()
+
+    def generate(ticker, media_format, research):
+        return Model(research, [media_format, ticker], api).generate()
+
+    def render(ticker, media_format, content, animation_prompt):
+        return Media(content, animation_prompt, [media_format, ticker], api).generate_media()
+
+    checkpoint = checkpoint or tickers_file + ".checkpoint.jsonl"
+    summary = summary or tickers_file + ".summary.json"
+    if restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    items = read_batch_file(tickers_file, default_format=media_format)
+    runner = BatchRunner(
+        items, scrape, generate, render, Checkpoint(checkpoint),
+        workers={
+            "scrape": config.getint("batch", "scrape_workers", fallback=8),
+            "generate": config.getint("batch", "generate_workers", fallback=4),
+            "render": config.getint("batch", "render_workers", fallback=2),
+        },
+    )
+    result = runner.run()
+    with open(summary, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=4)
+
+    for stage, stats in result["stages"].items():
+        click.echo("%-9s %4d done  mean %7.2fs  max %7.2fs" % (
+            stage, stats["count"], stats["mean_seconds"], stats["max_seconds"]))
+    for failure in result["failures"]:
+        click.echo("failed %s %s at %s: %s" % (
+            failure["ticker"], failure["media_format"], failure["stage"], failure["error"]), err=True)
+    click.echo("%d completed, %d skipped, %d failed in %.1fs; summary in %s" % (
+        result["completed"], result["skipped"], result["failed"], result["wall_seconds"], summary))
+    if result["failed"]:
+        sys.exit(1)
+
+
+@main.command("prefetch")
+@click.argument("tickers", nargs=-1)
+@click.option(
+    "--watchlist",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="file with one ticker per line [default: [prefetch] watchlist]",
+)
+@click.option("--top", type=int, default=None, help="also refresh the N most requested tickers [default: [prefetch] top]")
+@click.option("--once", is_flag=True, help="run one pass right away and exit")
+def prefetch(tickers, watchlist, top, once):
+    """
+    Keep research and scripts warm for a watchlist and the most requested tickers.
+    """
+    from .batch import read_batch_file
+    from .classes import ApiContext
+    from .prefetch import from_config, parse_tickers
+
+    load_dotenv()
+    api = ApiContext(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        stability_api_key=os.getenv("STABILITY_KEY"),
+        stability_host="grpc.stability.ai:443",
+    )
+
+    names = list(tickers)
+    if watchlist:
+        names += [ticker for ticker, _ in read_batch_file(watchlist)]
+    overrides = {} if top is None else {"top": top}
+    prefetcher = from_config(api, watchlist=parse_tickers(" ".join(names)) if names else None, **overrides)
+
+    if not once:
+        targets = list(prefetcher.watchlist)
+        if prefetcher.popular is not None and prefetcher.top > 0:
+            targets.append("the %d most requested tickers" % prefetcher.top)
+        click.echo("Refreshing %s every %ds" % (", ".join(targets) or "nothing", prefetcher.interval))
+        prefetcher.run()
+        return
+
+    results = prefetcher.run_once(spread=0)
+    if results is None:
+        click.echo("Another prefetch is running.", err=True)
+        sys.exit(1)
+    for ticker, result in results.items():
+        click.echo("%-6s %s" % (ticker, result))
+    if "failed" in results.values():
+        sys.exit(1)
+
+
 @main.command("debug")
 def debug():
     """
     Debug the chat function.
     """
+    from .classes import ApiContext
+    from .conversation import Conversation
     load_dotenv()
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     STABILITY_KEY = os.getenv("STABILITY_KEY")
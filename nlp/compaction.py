@@ -0,0 +1,105 @@
+import hashlib
+import re
+
+from .ratelimit import estimate_tokens
+
+# Placeholders WebScraper.fetch_article stores when it could not get an article.
+failed_content_prefixes = (
+    "Failed to fetch article",
+    "Error fetching the article",
+    "Content not found",
+)
+
+boilerplate_pattern = re.compile(
+    r"^(advertisement|story continues( below)?|sign in|sign up|subscribe( now)?|read more|"
+    r"click here|related quotes|recommended stories|most read|share|copy link|"
+    r"(©|copyright).*|all rights reserved.*|view comments|continue reading)\W*$",
+    re.IGNORECASE,
+)
+
+
+def normalize_content(text):
+    """Collapse whitespace, drop boilerplate and repeated lines."""
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line or boilerplate_pattern.match(line):
+            continue
+        if lines and lines[-1] == line:
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def simhash(text, bits=64):
+    """64-bit SimHash over word trigrams."""
+    words = text.lower().split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))]
+    weights = [0] * bits
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def truncate_to_tokens(text, tokens):
+    """Cut text to about ``tokens`` tokens, preferring a sentence boundary."""
+    if tokens <= 0:
+        return ""
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = max(cut.rfind(". "), cut.rfind("\n"))
+    return cut[:end + 1] if end > limit // 2 else cut
+
+
+def compact_research(articles, token_budget=48000, min_words=25, max_distance=3):
+    """Prepare scraped articles for a prompt.
+
+    Normalizes each article's text, drops failed and near-empty entries,
+    collapses near-duplicates (SimHash within ``max_distance`` bits, keeping
+    the longer copy in the earlier slot) and trims the result to
+    ``token_budget`` tokens, preserving the scraper's ordering.
+    """
+    kept = []
+    fingerprints = []
+    for article in articles:
+        content = article.get("content") or ""
+        if content.startswith(failed_content_prefixes):
+            continue
+        content = normalize_content(content)
+        if len(content.split()) < min_words:
+            continue
+
+        fingerprint = simhash(content)
+        duplicate = next(
+            (i for i, other in enumerate(fingerprints) if hamming(fingerprint, other) <= max_distance),
+            None,
+        )
+        if duplicate is not None:
+            if len(content) > len(kept[duplicate]["content"]):
+                kept[duplicate] = dict(article, content=content)
+                fingerprints[duplicate] = fingerprint
+            continue
+        kept.append(dict(article, content=content))
+        fingerprints.append(fingerprint)
+
+    compacted = []
+    remaining = token_budget
+    for article in kept:
+        overhead = estimate_tokens(article.get("title") or "") + estimate_tokens(article.get("url") or "")
+        tokens = overhead + estimate_tokens(article["content"])
+        if tokens > remaining:
+            content = truncate_to_tokens(article["content"], remaining - overhead)
+            if len(content.split()) >= min_words:
+                compacted.append(dict(article, content=content))
+            break
+        compacted.append(article)
+        remaining -= tokens
+    return compacted
@@ -0,0 +1,375 @@
+from typing import Any
+import hashlib
+import json
+import os
+import threading
+
+from llama_index.core import (
+    Document,
+    VectorStoreIndex,
+    SimpleDirectoryReader,
+    Settings,
+    StorageContext,
+    load_index_from_storage,
+)
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
+
+from . import config, nlp_path
+from .cache import EmbeddingCache
+from .metrics import metrics
+from .parser import DEFAULT_TICKERS_PATH, TickerIndex
+from .ratelimit import RateLimiter, estimate_tokens
+from .store import ResearchStore
+from .vectorstore import MmapVectorStore
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that only sends texts missing from an EmbeddingCache."""
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, **kwargs: Any) -> None:
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> list:
+        return self._embed_model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> list:
+        return await self._embed_model.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> list:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: list) -> list:
+        embeddings = self._cache.get_many(self.model_name, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        metrics.inc("nlp_cache_requests_total", len(texts) - len(missing), cache="embedding", result="hit")
+        metrics.inc("nlp_cache_requests_total", len(missing), cache="embedding", result="miss")
+        if missing:
+            batch = [texts[i] for i in missing]
+            tokens = sum(estimate_tokens(text) for text in batch)
+            fetched = RateLimiter.shared().governor("openai", self.model_name).call(
+                self._embed_model.get_text_embedding_batch,
+                batch,
+                tokens=tokens,
+            )
+            metrics.inc("nlp_tokens_total", tokens, model=self.model_name, kind="embedding")
+            self._cache.put_many(self.model_name, [texts[i] for i in missing], fetched)
+            for i, embedding in zip(missing, fetched):
+                embeddings[i] = embedding
+        return embeddings
+
+
+class HybridRetriever(BaseRetriever):
+    """Ticker-scoped retrieval that fuses BM25 and vector rankings.
+
+    Tickers named in the question restrict the similarity search to their
+    documents through metadata filters, so chunks about other tickers never
+    compete for the top-k. With the research store, a BM25 full-text query
+    over those tickers' articles first picks candidate articles; the vector
+    ranking of their chunks is then fused with the BM25 ranking by
+    reciprocal rank. Each step falls back to a wider search when it finds
+    nothing.
+    """
+
+    def __init__(
+        self,
+        index,
+        tickers,
+        ticker_index=None,
+        store=None,
+        similarity_top_k=2,
+        vector_top_k=10,
+        lexical_top_k=50,
+        rank_constant=60,
+    ):
+        super().__init__()
+        self.index = index
+        self.tickers = set(tickers)
+        self.ticker_index = ticker_index
+        self.store = store
+        self.similarity_top_k = similarity_top_k
+        self.vector_top_k = max(vector_top_k, similarity_top_k)
+        self.lexical_top_k = lexical_top_k
+        self.rank_constant = rank_constant
+
+    def scope(self, question) -> list:
+        """Indexed tickers the question is about; empty means all of them."""
+        if self.ticker_index is None:
+            return []
+        return sorted(self.ticker_index.find_tickers(question) & self.tickers)
+
+    def vector_search(self, query_bundle, filters) -> list:
+        retriever = self.index.as_retriever(
+            similarity_top_k=self.vector_top_k,
+            filters=MetadataFilters(filters=filters) if filters else None,
+        )
+        return retriever.retrieve(query_bundle)
+
+    def _retrieve(self, query_bundle) -> list:
+        tickers = self.scope(query_bundle.query_str)
+        filters = [MetadataFilter(key="ticker", value=tickers, operator=FilterOperator.IN)] if tickers else []
+
+        lexical = {}
+        if self.store is not None and self.lexical_top_k:
+            ranked = self.store.search(query_bundle.query_str, ticker=tickers, limit=self.lexical_top_k)
+            lexical = {article_id: rank for rank, (article_id, _) in enumerate(ranked)}
+
+        nodes = []
+        if lexical:
+            candidates = MetadataFilter(key="article_id", value=list(lexical), operator=FilterOperator.IN)
+            nodes = self.vector_search(query_bundle, filters + [candidates])
+        if not nodes and filters:
+            nodes = self.vector_search(query_bundle, filters)
+        if not nodes:
+            nodes = self.vector_search(query_bundle, [])
+
+        fused = []
+        for rank, node in enumerate(nodes):
+            score = 1.0 / (self.rank_constant + rank + 1)
+            lexical_rank = lexical.get(node.node.metadata.get("article_id"))
+            if lexical_rank is not None:
+                score += 1.0 / (self.rank_constant + lexical_rank + 1)
+            fused.append(NodeWithScore(node=node.node, score=score))
+        fused.sort(key=lambda node: node.score, reverse=True)
+        return fused[:self.similarity_top_k]
+
+
+class Conversation:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    PERSIST_DIR = os.path.join(BASE_DIR, "storage")
+    RESEARCH_DIR = os.path.join(BASE_DIR, "research")
+
+    def __init__(self) -> None:
+        self.store = ResearchStore.shared()
+        self.embed_model = self.get_embed_model()
+        if not os.path.exists(self.PERSIST_DIR):
+            self.storage_context = StorageContext.from_defaults(vector_store=self.get_vector_store(None))
+            self.index = VectorStoreIndex([], storage_context=self.storage_context, embed_model=self.embed_model)
+            self.manifest = {}
+        else:
+            self.storage_context = StorageContext.from_defaults(
+                persist_dir=self.PERSIST_DIR, vector_store=self.get_vector_store(self.PERSIST_DIR)
+            )
+            self.index = load_index_from_storage(self.storage_context, embed_model=self.embed_model)
+            self.manifest = self.load_manifest()
+
+        self.refresh()
+        self.query_engine = None
+        self.query_engine_lock = threading.Lock()
+
+    @staticmethod
+    def get_embed_model():
+        cache_dir = config.get(
+            "cache", "embedding_cache", fallback=os.path.join(nlp_path, "cache", "embeddings")
+        )
+        if not cache_dir:
+            return Settings.embed_model
+        return CachedEmbedding(Settings.embed_model, EmbeddingCache(cache_dir))
+
+    @staticmethod
+    def get_vector_store(persist_dir):
+        """The ``[conversation] vector_store`` backend, or None for llama_index's default.
+
+        "mmap" keeps embeddings in a memory-mapped NumPy array (see
+        MmapVectorStore); "simple" keeps them in llama_index's JSON file.
+        """
+        backend = config.get("conversation", "vector_store", fallback="mmap")
+        if backend == "simple":
+            return None
+        if backend != "mmap":
+            raise ValueError("unknown [conversation] vector_store %r" % backend)
+        dtype = config.get("conversation", "vector_dtype", fallback="float32")
+        if persist_dir is None:
+            return MmapVectorStore(dtype=dtype)
+        return MmapVectorStore.from_persist_dir(persist_dir, dtype=dtype)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.PERSIST_DIR, "research_manifest.json")
+
+    def load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+
+        # Stores built before the manifest existed have no record of which
+        # document came from which file, so they are re-indexed once.
+        for ref_doc_id in list(self.index.ref_doc_info):
+            self.index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+        return {}
+
+    @staticmethod
+    def hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 16), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def sources(self) -> dict:
+        """Content hash of every research source the index should hold.
+
+        With the research store these are the ``<ticker>:<article id>`` links
+        from the last ``[research] conversation_hours``; otherwise the files
+        in research/.
+        """
+        if self.store is not None:
+            hours = config.getfloat("research", "conversation_hours", fallback=168)
+            return {
+                "%s:%d" % (ticker, article_id): digest
+                for ticker, article_id, digest in self.store.entries(hours=hours or None)
+            }
+        current = {}
+        if os.path.isdir(self.RESEARCH_DIR):
+            for entry in os.scandir(self.RESEARCH_DIR):
+                if entry.is_file() and not entry.name.startswith("."):
+                    current[entry.name] = self.hash_file(entry.path)
+        return current
+
+    def load_documents(self, names) -> dict:
+        if self.store is None:
+            return {
+                name: SimpleDirectoryReader(
+                    input_files=[os.path.join(self.RESEARCH_DIR, name)],
+                    filename_as_id=True,
+                    file_metadata=lambda path: {
+                        "ticker": os.path.splitext(os.path.basename(path))[0],
+                        "file_name": os.path.basename(path),
+                    },
+                ).load_data()
+                for name in names
+            }
+        keys = {name: name.rsplit(":", 1) for name in names}
+        articles = self.store.articles(int(article_id) for _, article_id in keys.values())
+        return {
+            name: [self.article_document(name, ticker, articles[int(article_id)])]
+            for name, (ticker, article_id) in keys.items()
+            if int(article_id) in articles
+        }
+
+    @staticmethod
+    def article_document(name, ticker, article) -> Document:
+        return Document(
+            text=article["content"],
+            doc_id=name,
+            metadata={
+                "ticker": ticker,
+                "article_id": article["id"],
+                "title": article["title"] or "",
+                "url": article["url"],
+                "published_at": article["published_at"],
+            },
+            excluded_embed_metadata_keys=["article_id", "url", "published_at"],
+            excluded_llm_metadata_keys=["article_id"],
+        )
+
+    def refresh(self) -> bool:
+        """Bring the index in line with the research, touching only changed sources.
+
+        Returns True if the index was modified (and persisted).
+        """
+        current = self.sources()
+
+        changed = [
+            name for name, digest in current.items()
+            if self.manifest.get(name, {}).get("hash") != digest
+        ]
+        removed = [name for name in self.manifest if name not in current]
+        if not changed and not removed:
+            return False
+
+        for name in changed + removed:
+            for doc_id in self.manifest.pop(name, {}).get("doc_ids", []):
+                self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+
+        loaded = self.load_documents(changed)
+        documents = [document for documents in loaded.values() for document in documents]
+        if documents:
+            # Chunk every changed document in one pass so the embeddings go
+            # out in a few batched requests rather than one per document.
+            self.index.insert_nodes(run_transformations(documents, Settings.transformations))
+            for document in documents:
+                self.index.docstore.set_document_hash(document.get_doc_id(), document.hash)
+        for name, documents in loaded.items():
+            self.manifest[name] = {
+                "hash": current[name],
+                "doc_ids": [document.id_ for document in documents],
+            }
+
+        self.index.storage_context.persist(persist_dir=self.PERSIST_DIR)
+        with open(self.manifest_path, "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file, indent=4)
+        return True
+
+    @staticmethod
+    def fingerprint(directory):
+        if not os.path.isdir(directory):
+            return None
+        version = []
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if entry.is_file():
+                stat = entry.stat()
+                version.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+
+    @classmethod
+    def version(cls):
+        """Fingerprint of the persisted index and of the research it was built from."""
+        store = ResearchStore.shared()
+        research = store.version() if store is not None else cls.fingerprint(cls.RESEARCH_DIR)
+        return cls.fingerprint(cls.PERSIST_DIR), research
+
+    def indexed_tickers(self) -> set:
+        if self.store is not None:
+            return {name.rsplit(":", 1)[0] for name in self.manifest}
+        return {os.path.splitext(name)[0] for name in self.manifest}
+
+    def build_query_engine(self):
+        similarity_top_k = config.getint("conversation", "similarity_top_k", fallback=2)
+        if not config.getboolean("conversation", "hybrid", fallback=True):
+            return self.index.as_query_engine(similarity_top_k=similarity_top_k)
+        retriever = HybridRetriever(
+            self.index,
+            self.indexed_tickers(),
+            ticker_index=TickerIndex(
+                config.get("request", "tickers", fallback=None) or DEFAULT_TICKERS_PATH,
+                fuzzy_cutoff=config.getfloat("request", "fuzzy_cutoff", fallback=0.8),
+            ),
+            store=self.store,
+            similarity_top_k=similarity_top_k,
+            vector_top_k=config.getint("conversation", "vector_top_k", fallback=10),
+            lexical_top_k=config.getint("conversation", "lexical_top_k", fallback=50),
+        )
+        return RetrieverQueryEngine.from_args(retriever)
+
+    def get_query_engine(self):
+        """The query engine, built once per Conversation unless reuse is turned off."""
+        if not config.getboolean("conversation", "reuse_query_engine", fallback=True):
+            return self.build_query_engine()
+        with self.query_engine_lock:
+            if self.query_engine is None:
+                self.query_engine = self.build_query_engine()
+            return self.query_engine
+
+    @metrics.timed_stage("query")
+    def query(self, query):
+        response = self.get_query_engine().query(query)
+        return response
@@ -0,0 +1,169 @@
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, request_params):
+        self.id = uuid.uuid4().hex
+        self.media_format = request_params[0]
+        self.subject = request_params[1]
+        self.request_params = request_params
+        self.status = "queued"
+        self.stage = None
+        self.result = None
+        self.preview = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def set_stage(self, stage):
+        self.stage = stage
+        self.updated_at = time.time()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "media_format": self.media_format,
+            "subject": self.subject,
+            "status": self.status,
+            "stage": self.stage,
+            "preview": self.preview,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class JobQueue:
+    """Runs pipeline jobs on a bounded worker pool and keeps their status.
+
+    ``run`` is called as ``run(job)`` on a worker thread. It should report
+    progress through ``job.set_stage`` and return the job's result. Finished
+    jobs are kept in memory until ``keep`` newer jobs have been submitted.
+    """
+
+    def __init__(self, run, max_workers=2, keep=1000):
+        self.run = run
+        self.keep = keep
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, request_params) -> Job:
+        job = Job(request_params)
+        with self.lock:
+            self.jobs[job.id] = job
+            self.prune()
+        self.executor.submit(self.execute, job)
+        return job
+
+    def execute(self, job):
+        job.status = "running"
+        job.updated_at = time.time()
+        try:
+            job.result = self.run(job)
+            job.status = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = "failed"
+        job.updated_at = time.time()
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def active(self):
+        with self.lock:
+            return {job_id for job_id, job in self.jobs.items() if not job.finished}
+
+    def prune(self):
+        # Caller holds self.lock. Dicts keep insertion order, so the oldest
+        # finished jobs come first.
+        excess = len(self.jobs) - self.keep
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id].finished:
+                del self.jobs[job_id]
+                excess -= 1
+
+
+class ArtifactJanitor:
+    """Keeps per-job output directories under a disk quota.
+
+    Directories are stamped with ``touch`` whenever they are served. When
+    the total size goes over ``max_bytes``, the least recently served
+    directories are deleted first. Directories named by ``protect()`` (jobs
+    that are still running) are never deleted.
+    """
+
+    def __init__(self, directory, max_bytes, interval=300, protect=None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.protect = protect or (lambda: set())
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def touch(self, job_id):
+        path = os.path.join(self.directory, job_id)
+        if os.path.isdir(path):
+            os.utime(path)
+
+    @staticmethod
+    def size(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def sweep(self):
+        """Delete least recently served job directories until under quota."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for entry in os.scandir(self.directory):
+            # Shared inputs and other non-job directories are left alone.
+            if entry.is_dir() and len(entry.name) == 32:
+                entries.append((entry.stat().st_mtime, entry.name, self.size(entry.path)))
+        total = sum(size for _, _, size in entries)
+        protected = self.protect()
+        evicted = []
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name in protected:
+                continue
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            total -= size
+            evicted.append(name)
+        return evicted
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="janitor", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,181 @@
+import bisect
+import contextlib
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+descriptions = {
+    "nlp_stage_seconds": ("histogram", "Wall time of pipeline stages."),
+    "nlp_stage_errors_total": ("counter", "Pipeline stages that raised."),
+    "nlp_external_call_seconds": ("histogram", "Latency of single external API and HTTP call attempts."),
+    "nlp_external_call_errors_total": ("counter", "External call attempts that raised."),
+    "nlp_ratelimit_wait_seconds": ("histogram", "Time calls spent waiting for rate-limit budget."),
+    "nlp_retries_total": ("counter", "External calls retried after a transient error."),
+    "nlp_cache_requests_total": ("counter", "Cache lookups by cache and result."),
+    "nlp_tokens_total": ("counter", "Tokens used by model and kind."),
+    "nlp_prefetch_total": ("counter", "Background ticker refreshes by result."),
+}
+
+
+class Histogram:
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        '%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metrics:
+    """Process-wide counters, latency histograms and an optional span trace.
+
+    ``stage`` times a pipeline stage and ``call`` a single external call;
+    both feed histograms and, when ``tracing`` is on, record a span with its
+    parent span on the same thread. ``render`` produces the Prometheus text
+    format and ``dump_trace`` writes the spans and counters as JSON.
+    """
+
+    def __init__(self, max_spans=100000):
+        self.counters = {}
+        self.histograms = {}
+        self.spans = deque(maxlen=max_spans)
+        self.tracing = False
+        self.ids = itertools.count(1)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.spans.clear()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def count(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    @contextlib.contextmanager
+    def span(self, name, histogram, errors, **labels):
+        stack = self.local.__dict__.setdefault("stack", [])
+        span_id = next(self.ids)
+        parent = stack[-1] if stack else None
+        stack.append(span_id)
+        started_at = time.time()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            self.inc(errors, **labels)
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            stack.pop()
+            self.observe(histogram, seconds, **labels)
+            if self.tracing:
+                self.spans.append({
+                    "id": span_id,
+                    "parent": parent,
+                    "name": name,
+                    "labels": labels,
+                    "thread": threading.current_thread().name,
+                    "start": started_at,
+                    "seconds": seconds,
+                    "error": error,
+                })
+
+    def stage(self, stage):
+        return self.span(stage, "nlp_stage_seconds", "nlp_stage_errors_total", stage=stage)
+
+    def call(self, provider, model):
+        return self.span(
+            "%s:%s" % (provider, model), "nlp_external_call_seconds", "nlp_external_call_errors_total",
+            provider=provider, model=model,
+        )
+
+    def timed_stage(self, stage):
+        """Decorator form of ``stage``."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self) -> str:
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in self.histograms.items()
+            )
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, text = descriptions.get(name, ("untyped", ""))
+                lines.append("# HELP %s %s" % (name, text))
+                lines.append("# TYPE %s %s" % (name, kind))
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append("%s%s %s" % (name, format_labels(labels), value))
+        for (name, labels), buckets, counts, total, count in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append("%s_bucket%s %d" % (name, format_labels(labels, [("le", bound)]), cumulative))
+            lines.append("%s_sum%s %s" % (name, format_labels(labels), total))
+            lines.append("%s_count%s %d" % (name, format_labels(labels), count))
+        return "\n".join(lines) + "\n"
+
+    def dump_trace(self, path):
+        with self.lock:
+            trace = {
+                "spans": list(self.spans),
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+            }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(trace, file, indent=4)
+
+
+metrics = Metrics()
@@ -0,0 +1,128 @@
+import difflib
+import json
+import os
+import re
+
+DEFAULT_TICKERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tickers.json")
+
+media_format_keywords = {
+    "text": {"text", "texts", "article", "articles", "newsletter", "written", "read", "summary", "brief", "briefing"},
+    "audio": {"audio", "podcast", "listen", "speech", "mp3", "voice", "spoken"},
+    "video": {"video", "videos", "watch", "clip", "animation", "mp4", "movie"},
+}
+
+# Uppercase words that show up in requests but are not meant as tickers.
+not_tickers = {"I", "A", "AN", "THE", "AND", "OR", "ON", "IN", "OF", "FOR", "TO", "ME", "MY", "PLEASE", "NEWS", "STOCK"}
+
+token_pattern = re.compile(r"\$?[A-Za-z0-9][A-Za-z0-9.&'-]*")
+
+
+class TickerIndex:
+    """Local lookup of tickers by symbol or company name.
+
+    ``parse`` resolves a request such as "AAPL video" or "a podcast about
+    microsoft" without a model call. It returns ``None`` when the request
+    is ambiguous, so the caller can fall back to the LLM.
+    """
+
+    def __init__(self, path=DEFAULT_TICKERS_PATH, fuzzy_cutoff=0.8):
+        with open(path, "r", encoding="utf-8") as file:
+            entries = json.load(file)
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.tickers = {entry["ticker"].upper() for entry in entries}
+        self.names = {}
+        for entry in entries:
+            for name in [entry["name"]] + entry.get("aliases", []):
+                self.names[self.normalize(name)] = entry["ticker"].upper()
+        self.max_name_words = max(len(name.split()) for name in self.names)
+
+    @staticmethod
+    def normalize(text):
+        text = text.lower().replace("&", " and ")
+        text = re.sub(r"[^a-z0-9 ]", "", text)
+        return " ".join(text.split())
+
+    def lookup(self, subject):
+        """Resolve a single ticker symbol or company name, or return None."""
+        symbol = subject.strip().lstrip("$").upper()
+        if symbol in self.tickers:
+            return symbol
+        name = self.normalize(subject)
+        if name in self.names:
+            return self.names[name]
+        matches = difflib.get_close_matches(name, self.names, n=1, cutoff=self.fuzzy_cutoff)
+        return self.names[matches[0]] if matches else None
+
+    @staticmethod
+    def guessed_tickers(message):
+        """All-caps words that read like tickers, whether or not they are indexed."""
+        guesses = set()
+        for token in token_pattern.findall(message):
+            symbol = token.rstrip(".'")
+            if (
+                symbol.isupper()
+                and symbol.isalpha()
+                and 2 <= len(symbol) <= 5
+                and symbol not in not_tickers
+                and not any(symbol.lower() in keywords for keywords in media_format_keywords.values())
+            ):
+                guesses.add(symbol)
+        return guesses
+
+    def find_tickers(self, message):
+        tokens = token_pattern.findall(message)
+        found = set()
+
+        for token in tokens:
+            symbol = token.lstrip("$").rstrip(".'")
+            if token.startswith("$") or (symbol.isupper() and symbol.upper() in self.tickers):
+                found.add(symbol.upper())
+
+        # "Tesla's" names Tesla.
+        words = [self.normalize(re.sub(r"'s$", "", token)) for token in tokens]
+        words = [word for word in words if word]
+        for size in range(self.max_name_words, 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if phrase in self.names:
+                    found.add(self.names[phrase])
+        if found:
+            return found
+
+        for size in range(self.max_name_words, 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if len(phrase) < 4:
+                    continue
+                matches = difflib.get_close_matches(phrase, self.names, n=1, cutoff=self.fuzzy_cutoff)
+                if matches:
+                    found.add(self.names[matches[0]])
+        if found:
+            return found
+
+        # An all-caps word the user typed deliberately, even if it is not in
+        # the index; only trusted when nothing indexed matched.
+        return self.guessed_tickers(message) - self.tickers
+
+    @staticmethod
+    def find_media_formats(message):
+        words = {word.lower() for word in re.findall(r"[A-Za-z0-9]+", message)}
+        return {
+            media_format
+            for media_format, keywords in media_format_keywords.items()
+            if words & keywords
+        }
+
+    def parse(self, message):
+        """Return [media_format, ticker] for an unambiguous request, else None."""
+        media_formats = self.find_media_formats(message)
+        if len(media_formats) != 1:
+            return None
+        tickers = self.find_tickers(message)
+        if len(tickers) != 1:
+            return None
+        if not self.guessed_tickers(message) - self.tickers <= tickers:
+            # An unindexed all-caps word ("EV", "IPO") next to an indexed
+            # company: let the LLM decide which one was meant.
+            return None
+        return [media_formats.pop(), tickers.pop()]
@@ -0,0 +1,168 @@
+import contextlib
+import fcntl
+import os
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import metrics
+
+
+def parse_tickers(text) -> list:
+    """Tickers from a comma- or space-separated list, upper-cased, in order, without repeats."""
+    tickers = []
+    for word in text.replace(",", " ").split():
+        ticker = word.lstrip("$").upper()
+        if ticker not in tickers:
+            tickers.append(ticker)
+    return tickers
+
+
+class Prefetcher:
+    """Refreshes the watchlist and the most requested tickers in the background.
+
+    Every ``interval`` seconds (varied by ``jitter``, a fraction of the
+    interval) ``refresh(ticker)`` runs for each watchlist ticker and for the
+    ``top`` tickers returned by ``popular(top)``, on at most ``workers``
+    threads. Each ticker also starts after a random offset within the
+    jitter window, so a pass does not hit every upstream at once. With
+    ``lock_path`` a pass only runs while holding an exclusive lock on that
+    file, so several app processes on one host do not prefetch in parallel.
+    """
+
+    def __init__(
+        self,
+        refresh,
+        watchlist=(),
+        popular=None,
+        top=10,
+        interval=600,
+        jitter=0.2,
+        workers=2,
+        lock_path=None,
+    ):
+        self.refresh = refresh
+        self.watchlist = list(watchlist)
+        self.popular = popular
+        self.top = top
+        self.interval = interval
+        self.jitter = jitter
+        self.workers = max(1, workers)
+        self.lock_path = lock_path
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last_pass = None
+
+    def tickers(self) -> list:
+        tickers = list(self.watchlist)
+        if self.popular is not None and self.top > 0:
+            for ticker in self.popular(self.top):
+                if ticker not in tickers:
+                    tickers.append(ticker)
+        return tickers
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Yields whether this process may run a pass now."""
+        if not self.lock_path:
+            yield True
+            return
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with open(self.lock_path, "a") as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def refresh_one(self, ticker):
+        try:
+            with metrics.stage("prefetch"):
+                self.refresh(ticker)
+        except Exception:
+            traceback.print_exc()
+            metrics.inc("nlp_prefetch_total", result="failed")
+            return "failed"
+        metrics.inc("nlp_prefetch_total", result="done")
+        return "done"
+
+    def run_once(self, spread=None) -> dict:
+        """One pass over every ticker; returns each ticker's result, or None if another process holds the lock."""
+        spread = self.interval * self.jitter if spread is None else spread
+        with self.exclusive() as acquired:
+            if not acquired:
+                return None
+            tickers = self.tickers()
+            started = time.monotonic()
+            # Offsets are waited out here rather than on the workers, so a
+            # ticker waiting for its turn does not hold a worker.
+            offsets = sorted((random.uniform(0, spread), ticker) for ticker in tickers)
+            futures = {}
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch") as executor:
+                for offset, ticker in offsets:
+                    if self.stopped.wait(max(0.0, started + offset - time.monotonic())):
+                        break
+                    futures[ticker] = executor.submit(self.refresh_one, ticker)
+                results = {
+                    ticker: futures[ticker].result() if ticker in futures else "skipped" for ticker in tickers
+                }
+        self.last_pass = {"finished_at": time.time(), "results": results}
+        return results
+
+    def delay(self) -> float:
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run(self):
+        # The first pass starts soon after launch, so a restarted server
+        # warms up without waiting a whole interval.
+        delay = random.uniform(0, self.interval * self.jitter)
+        while not self.stopped.wait(delay):
+            try:
+                self.run_once()
+            except Exception:
+                traceback.print_exc()
+            delay = self.delay()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="prefetcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+
+def warm(ticker, api_context, formats=("text",)):
+    """Scrape ``ticker`` and generate its scripts, filling the research store and completion cache."""
+    from .classes import Model, WebScraper
+
+    research = WebScraper(("text", ticker)).scrape(max_age=0)
+    for media_format in formats:
+        Model(research, (media_format, ticker), api_context).generate()
+
+
+def from_config(api_context, watchlist=None, **overrides) -> Prefetcher:
+    """A Prefetcher set up from the ``[prefetch]`` section; keyword arguments override it."""
+    from . import config, nlp_path
+    from .store import ResearchStore
+
+    formats = config.get("prefetch", "formats", fallback="text").replace(",", " ").lower().split()
+    store = ResearchStore.shared()
+    hours = config.getfloat("prefetch", "popular_hours", fallback=24)
+    settings = {
+        "watchlist": parse_tickers(config.get("prefetch", "watchlist", fallback="")) if watchlist is None else watchlist,
+        "popular": (lambda limit: store.popular(hours=hours, limit=limit)) if store is not None else None,
+        "top": config.getint("prefetch", "top", fallback=10),
+        "interval": config.getfloat("prefetch", "interval", fallback=600),
+        "jitter": config.getfloat("prefetch", "jitter", fallback=0.2),
+        "workers": config.getint("prefetch", "workers", fallback=2),
+        "lock_path": os.path.join(nlp_path, "prefetch.lock"),
+    }
+    settings.update(overrides)
+    return Prefetcher(lambda ticker: warm(ticker, api_context, formats), **settings)
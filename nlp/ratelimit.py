@@ -0,0 +1,216 @@
+import email.utils
+import random
+import threading
+import time
+
+from .metrics import metrics
+
+retryable_status_codes = {408, 409, 429, 500, 502, 503, 504}
+retryable_grpc_codes = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED"}
+retryable_error_names = {"APIConnectionError", "APITimeoutError"}
+
+
+class TokenBucket:
+    """Refills ``rate`` units per minute up to a burst of one minute's worth.
+
+    ``acquire`` blocks until the requested amount is available. A request
+    larger than the whole bucket waits for a full bucket and then drives it
+    negative, so oversized calls are still admitted but pay for it later.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate / 60.0)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        if not self.rate or amount <= 0:
+            return
+        while True:
+            with self.lock:
+                self.refill()
+                needed = min(amount, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return
+                wait = (needed - self.tokens) * 60.0 / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount):
+        """Charge (or refund, if negative) ``amount`` after the fact."""
+        if not self.rate:
+            return
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, if it said so."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time()) if date else None
+
+
+def is_retryable(error):
+    if type(error).__name__ in retryable_error_names:
+        return True
+    if getattr(error, "status_code", None) in retryable_status_codes:
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            return getattr(code(), "name", None) in retryable_grpc_codes
+        except Exception:
+            return False
+    return False
+
+
+class Governor:
+    """Request, token and concurrency limits for one provider/model pair.
+
+    ``call`` waits for request and token budget and an in-flight slot, then
+    runs the call. Rate-limit and transient errors are retried with jittered
+    exponential backoff. A ``Retry-After`` from the server pauses every
+    caller of this governor, not just the one that got the error.
+    """
+
+    def __init__(
+        self, rpm=0, tpm=0, max_in_flight=8, max_retries=5, base_delay=0.5, max_delay=60.0, provider=None, model=None,
+    ):
+        self.provider = provider
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def wait_if_paused(self):
+        while True:
+            with self.lock:
+                wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def backoff(self, attempt, error):
+        delay = retry_after(error)
+        if delay is not None:
+            self.pause(delay)
+            return delay
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def call(self, fn, /, *args, tokens=0, **kwargs):
+        labels = {"provider": self.provider or "unknown", "model": self.model or "unknown"}
+        attempt = 0
+        while True:
+            waited = time.perf_counter()
+            self.wait_if_paused()
+            self.requests.acquire(1)
+            self.tokens.acquire(tokens)
+            with self.in_flight:
+                metrics.observe("nlp_ratelimit_wait_seconds", time.perf_counter() - waited, **labels)
+                try:
+                    with metrics.call(labels["provider"], labels["model"]):
+                        return fn(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    delay = self.backoff(attempt, e)
+            metrics.inc("nlp_retries_total", **labels)
+            attempt += 1
+            time.sleep(delay)
+
+
+class RateLimiter:
+    """Process-wide registry of governors, one per (provider, model).
+
+    Limits come from the ``[ratelimit]`` config section. A
+    ``<provider>.<model>_<limit>`` key overrides ``<provider>_<limit>``, e.g.
+    ``openai.tts-1_rpm = 50`` next to ``openai_rpm = 3500``.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    defaults = {
+        "rpm": 0,
+        "tpm": 0,
+        "in_flight": 8,
+    }
+
+    def __init__(self, config=None):
+        self.config = config
+        self.governors = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                from . import config
+
+                cls._shared = cls(config)
+            return cls._shared
+
+    def setting(self, provider, model, name):
+        fallback = self.defaults[name]
+        if self.config is None:
+            return fallback
+        value = self.config.getint("ratelimit", "%s_%s" % (provider, name), fallback=fallback)
+        return self.config.getint("ratelimit", "%s.%s_%s" % (provider, model, name), fallback=value)
+
+    def governor(self, provider, model) -> Governor:
+        with self.lock:
+            key = (provider, model)
+            if key not in self.governors:
+                self.governors[key] = Governor(
+                    rpm=self.setting(provider, model, "rpm"),
+                    tpm=self.setting(provider, model, "tpm"),
+                    max_in_flight=self.setting(provider, model, "in_flight"),
+                    max_retries=self.config.getint("ratelimit", "max_retries", fallback=5) if self.config else 5,
+                    max_delay=self.config.getfloat("ratelimit", "max_delay", fallback=60.0) if self.config else 60.0,
+                    provider=provider,
+                    model=model,
+                )
+            return self.governors[key]
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) used for TPM budgeting."""
+    return len(text) // 4 + 1
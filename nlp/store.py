@@ -0,0 +1,275 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .compaction import failed_content_prefixes, normalize_content
+
+
+class ResearchStore:
+    """SQLite store of scraped articles with per-ticker history.
+
+    An article is stored once, unique by URL and by a hash of its normalized
+    text, so a syndicated story scraped for several tickers (or under
+    several URLs) is kept a single time and linked to each ticker. Links
+    record when each ticker's scrape saw the article, indexed by ticker and
+    publish time, so readers can pull e.g. the last 48 hours for one ticker
+    in a single query. ``search`` runs a BM25-ranked full-text query.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                content_hash TEXT NOT NULL UNIQUE,
+                title TEXT,
+                content TEXT NOT NULL,
+                published_at REAL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS article_tickers (
+                ticker TEXT NOT NULL,
+                article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+                published_at REAL NOT NULL,
+                scraped_at REAL NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (ticker, article_id)
+            );
+            CREATE INDEX IF NOT EXISTS article_tickers_published
+                ON article_tickers (ticker, published_at);
+            CREATE INDEX IF NOT EXISTS article_tickers_scraped ON article_tickers (scraped_at);
+            CREATE TABLE IF NOT EXISTS requests (
+                ticker TEXT NOT NULL,
+                requested_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS requests_requested ON requests (requested_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5 (
+                title, content, content='articles', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+                INSERT INTO articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+            """
+        )
+        self.conn.commit()
+
+    @classmethod
+    def shared(cls):
+        """The store named by ``[research] store``, or None to use JSON files."""
+        from . import config, nlp_path
+
+        path = config.get("research", "store", fallback=os.path.join(nlp_path, "research.sqlite"))
+        if not path:
+            return None
+        with cls._shared_lock:
+            if cls._shared is None:
+                created = not os.path.exists(path)
+                cls._shared = cls(path)
+                if created:
+                    # Carry over research scraped before the store existed.
+                    legacy_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "research")
+                    cls._shared.import_json(legacy_dir)
+            return cls._shared
+
+    @staticmethod
+    def is_store(path):
+        """True if ``path`` is an SQLite database rather than a JSON research file."""
+        try:
+            with open(path, "rb") as file:
+                return file.read(16) == b"SQLite format 3\x00"
+        except (OSError, TypeError):
+            return False
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+
+    def save(self, ticker, articles, scraped_at=None):
+        """Store one scrape of ``ticker``; returns the ids of the stored articles.
+
+        Placeholders for articles that could not be fetched are skipped. A
+        story already stored under another URL or for another ticker is
+        linked rather than duplicated; a changed body at a known URL
+        replaces the old one.
+        """
+        scraped_at = scraped_at or time.time()
+        ids = []
+        with self.lock, self.conn:
+            for position, article in enumerate(articles):
+                content = article.get("content") or ""
+                if not content.strip() or content.startswith(failed_content_prefixes):
+                    continue
+                digest = self.content_hash(content)
+                published_at = article.get("published_at") or scraped_at
+                row = self.conn.execute(
+                    "SELECT id FROM articles WHERE content_hash = ? OR url = ? ORDER BY content_hash = ? DESC",
+                    (digest, article["url"], digest),
+                ).fetchone()
+                if row is None:
+                    article_id = self.conn.execute(
+                        "INSERT INTO articles (url, content_hash, title, content, published_at, fetched_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (article["url"], digest, article.get("title"), content, published_at, scraped_at),
+                    ).lastrowid
+                else:
+                    article_id = row["id"]
+                    self.conn.execute(
+                        "UPDATE articles SET content_hash = ?, title = ?, content = ?, fetched_at = ? "
+                        "WHERE id = ? AND content_hash != ?",
+                        (digest, article.get("title"), content, scraped_at, article_id, digest),
+                    )
+                self.conn.execute(
+                    "INSERT INTO article_tickers (ticker, article_id, published_at, scraped_at, position) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (ticker, article_id) DO UPDATE SET "
+                    "scraped_at = excluded.scraped_at, position = excluded.position",
+                    (ticker, article_id, published_at, scraped_at, position),
+                )
+                ids.append(article_id)
+        return ids
+
+    def recent(self, ticker, hours=None, limit=None) -> list:
+        """Articles for ``ticker`` published in the last ``hours``, newest scrape first."""
+        since = time.time() - hours * 3600 if hours else 0
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT a.id, a.title, a.url, a.content, t.published_at FROM article_tickers t "
+                "JOIN articles a ON a.id = t.article_id "
+                "WHERE t.ticker = ? AND t.published_at >= ? "
+                "ORDER BY t.scraped_at DESC, t.position LIMIT ?",
+                (ticker, since, limit or -1),
+            ).fetchall()
+        return [
+            {"title": row["title"], "url": row["url"], "content": row["content"], "published_at": row["published_at"]}
+            for row in rows
+        ]
+
+    def latest_scrape(self, ticker, limit=None) -> list:
+        """Articles seen by the most recent scrape of ``ticker``, however old they are."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT a.id, a.title, a.url, a.content, t.published_at FROM article_tickers t "
+                "JOIN articles a ON a.id = t.article_id "
+                "WHERE t.ticker = ? AND t.scraped_at = "
+                "(SELECT MAX(scraped_at) FROM article_tickers WHERE ticker = ?) "
+                "ORDER BY t.position LIMIT ?",
+                (ticker, ticker, limit or -1),
+            ).fetchall()
+        return [
+            {"title": row["title"], "url": row["url"], "content": row["content"], "published_at": row["published_at"]}
+            for row in rows
+        ]
+
+    def last_scraped(self, ticker):
+        """When a scrape of ``ticker`` last stored anything, or None."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT MAX(scraped_at) FROM article_tickers WHERE ticker = ?", (ticker,)
+            ).fetchone()[0]
+
+    def record_request(self, ticker, requested_at=None, keep_days=30):
+        requested_at = requested_at or time.time()
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO requests (ticker, requested_at) VALUES (?, ?)", (ticker, requested_at))
+            self.conn.execute("DELETE FROM requests WHERE requested_at < ?", (requested_at - keep_days * 86400,))
+
+    def popular(self, hours=24, limit=10) -> list:
+        """The most requested tickers of the last ``hours``, most requested first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ticker FROM requests WHERE requested_at >= ? "
+                "GROUP BY ticker ORDER BY COUNT(*) DESC, MAX(requested_at) DESC LIMIT ?",
+                (time.time() - hours * 3600, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def entries(self, hours=None) -> list:
+        """(ticker, article_id, content_hash) for every link in the window, without bodies."""
+        since = time.time() - hours * 3600 if hours else 0
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT t.ticker, t.article_id, a.content_hash FROM article_tickers t "
+                "JOIN articles a ON a.id = t.article_id WHERE t.published_at >= ?",
+                (since,),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def articles(self, ids) -> dict:
+        ids = list(ids)
+        found = {}
+        with self.lock:
+            # Stay under SQLite's bound-parameter limit.
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                rows = self.conn.execute(
+                    "SELECT id, title, url, content, published_at FROM articles WHERE id IN (%s)"
+                    % ",".join("?" * len(batch)),
+                    batch,
+                ).fetchall()
+                found.update((row["id"], dict(row)) for row in rows)
+        return found
+
+    def search(self, query, ticker=None, limit=20) -> list:
+        """(article_id, bm25 score) pairs best first; higher scores are better.
+
+        ``ticker`` limits the search to one ticker's articles, or to any of
+        several when given a list.
+        """
+        terms = " OR ".join('"%s"' % term.replace('"', '""') for term in query.split() if term.strip())
+        if not terms:
+            return []
+        tickers = [ticker] if isinstance(ticker, str) else list(ticker or [])
+        sql = "SELECT f.rowid, -bm25(articles_fts) AS score FROM articles_fts f WHERE articles_fts MATCH ? "
+        args = [terms]
+        if tickers:
+            sql += "AND f.rowid IN (SELECT article_id FROM article_tickers WHERE ticker IN (%s)) " % ",".join(
+                "?" * len(tickers)
+            )
+            args.extend(tickers)
+        sql += "ORDER BY score DESC LIMIT ?"
+        args.append(limit)
+        with self.lock:
+            return [tuple(row) for row in self.conn.execute(sql, args).fetchall()]
+
+    def version(self):
+        """Changes whenever a scrape is saved."""
+        with self.lock:
+            return tuple(self.conn.execute(
+                "SELECT COUNT(*), MAX(scraped_at), (SELECT MAX(fetched_at) FROM articles) FROM article_tickers"
+            ).fetchone())
+
+    def import_json(self, directory):
+        """Load research/<ticker>.json files, dated by their modification time."""
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    articles = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(articles, list):
+                continue
+            ticker = os.path.splitext(os.path.basename(path))[0]
+            articles = [article for article in articles if isinstance(article, dict) and article.get("url")]
+            self.save(ticker, articles, scraped_at=os.path.getmtime(path))
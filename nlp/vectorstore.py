@@ -0,0 +1,353 @@
+import glob
+import json
+import os
+import threading
+import uuid
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+
+comparisons = {
+    FilterOperator.EQ: lambda value, target: value == target,
+    FilterOperator.NE: lambda value, target: value != target,
+    FilterOperator.GT: lambda value, target: value > target,
+    FilterOperator.GTE: lambda value, target: value >= target,
+    FilterOperator.LT: lambda value, target: value < target,
+    FilterOperator.LTE: lambda value, target: value <= target,
+    FilterOperator.IN: lambda value, target: value in target,
+    FilterOperator.NIN: lambda value, target: value not in target,
+    FilterOperator.CONTAINS: lambda value, target: target in value,
+    FilterOperator.TEXT_MATCH: lambda value, target: target.lower() in value.lower(),
+    FilterOperator.ANY: lambda value, target: any(item in value for item in target),
+    FilterOperator.ALL: lambda value, target: all(item in value for item in target),
+}
+
+# Metadata keys with a row index, so equality filters on them touch only the
+# matching rows instead of scanning every row's metadata.
+indexed_keys = ("ticker", "article_id")
+
+block_rows = 8192
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """Vector store that keeps embeddings in a memory-mapped NumPy array.
+
+    ``persist`` writes the unit-normalized embeddings as one contiguous
+    float32 (or float16) ``.npy`` file next to a JSON sidecar with the node
+    ids, ref doc ids and metadata. Loading maps the array read-only instead
+    of parsing it, so it is near-instant and every process serving the same
+    index shares the pages through the OS cache. Each persist writes a new
+    array file and swaps the sidecar over to it, so readers that still map
+    the old one are unaffected.
+
+    Cosine similarity is one matrix-vector product over the candidate rows.
+    Filters on ``ticker`` and ``article_id`` use a row index, so a search
+    scoped to one ticker only reads that ticker's rows.
+    """
+
+    stores_text: bool = False
+    dtype: str = "float32"
+
+    _vectors: Any = PrivateAttr()
+    _added: Any = PrivateAttr()
+    _alive: Any = PrivateAttr()
+    _ids: list = PrivateAttr()
+    _ref_doc_ids: list = PrivateAttr()
+    _metadata: list = PrivateAttr()
+    _rows_by_id: dict = PrivateAttr()
+    _rows_by_ref: dict = PrivateAttr()
+    _postings: dict = PrivateAttr()
+    _dirty: bool = PrivateAttr()
+    _lock: Any = PrivateAttr()
+
+    def __init__(self, dtype: str = "float32", **kwargs: Any) -> None:
+        if np.dtype(dtype) not in (np.float32, np.float16):
+            raise ValueError("dtype must be float32 or float16, not %r" % dtype)
+        super().__init__(dtype=np.dtype(dtype).name, **kwargs)
+        self._lock = threading.Lock()
+        self._reset(np.zeros((0, 0), dtype=np.float32))
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir, namespace="default", dtype="float32") -> "MmapVectorStore":
+        return cls.from_persist_path(os.path.join(persist_dir, "%s__vector_store.json" % namespace), dtype=dtype)
+
+    @classmethod
+    def from_persist_path(cls, persist_path, dtype="float32") -> "MmapVectorStore":
+        """Map a persisted store, converting a SimpleVectorStore file in place."""
+        store = cls(dtype=dtype)
+        if not os.path.exists(persist_path):
+            return store
+        with open(persist_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("format") == "mmap":
+            store._load(os.path.dirname(persist_path), data)
+        else:
+            embeddings = data.get("embedding_dict", {})
+            ids = list(embeddings)
+            refs = data.get("text_id_to_ref_doc_id", {})
+            metadata = data.get("metadata_dict", {})
+            store._append(
+                ids,
+                [refs.get(node_id) for node_id in ids],
+                [metadata.get(node_id) or {} for node_id in ids],
+                [embeddings[node_id] for node_id in ids],
+            )
+            store.persist(persist_path)
+        return store
+
+    def _reset(self, vectors, ids=(), ref_doc_ids=(), metadata=()):
+        self._vectors = vectors
+        self._added = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        self._alive = np.ones(len(vectors), dtype=bool)
+        self._ids = []
+        self._ref_doc_ids = []
+        self._metadata = []
+        self._rows_by_id = {}
+        self._rows_by_ref = {}
+        self._postings = {key: {} for key in indexed_keys}
+        self._dirty = False
+        self._index_rows(list(ids), list(ref_doc_ids), list(metadata))
+
+    def _load(self, directory, data):
+        path = os.path.join(directory, data["vectors"])
+        if data["ids"]:
+            vectors = np.load(path, mmap_mode="r")
+        else:
+            vectors = np.zeros((0, data["dim"]), dtype=data["dtype"])
+        self._reset(vectors, data["ids"], data["ref_doc_ids"], data["metadata"])
+
+    def _index_rows(self, ids, ref_doc_ids, metadata):
+        start = len(self._ids)
+        self._ids.extend(ids)
+        self._ref_doc_ids.extend(ref_doc_ids)
+        self._metadata.extend(metadata)
+        for row, (node_id, ref_doc_id, meta) in enumerate(zip(ids, ref_doc_ids, metadata), start):
+            self._rows_by_id[node_id] = row
+            self._rows_by_ref.setdefault(ref_doc_id, []).append(row)
+            for key in indexed_keys:
+                if meta.get(key) is not None:
+                    self._postings[key].setdefault(meta[key], []).append(row)
+
+    def _append(self, ids, ref_doc_ids, metadata, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if not len(ids):
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        with self._lock:
+            if len(self._ids) == 0:
+                self._vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+                self._added = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            elif vectors.shape[1] != self._added.shape[1]:
+                raise ValueError(
+                    "embedding has %d dimensions, the store holds %d" % (vectors.shape[1], self._added.shape[1])
+                )
+            # Replace rather than resize in place, so a query running
+            # concurrently keeps a consistent snapshot.
+            self._added = np.concatenate([self._added, vectors])
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._index_rows(ids, ref_doc_ids, metadata)
+            self._dirty = True
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        ids = [node.node_id for node in nodes]
+        self._append(
+            ids,
+            [node.ref_doc_id for node in nodes],
+            [dict(node.metadata) for node in nodes],
+            [node.get_embedding() for node in nodes],
+        )
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            rows = self._rows_by_ref.pop(ref_doc_id, [])
+            if rows:
+                alive = self._alive.copy()
+                alive[rows] = False
+                self._alive = alive
+                for row in rows:
+                    self._rows_by_id.pop(self._ids[row], None)
+                self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset(np.zeros((0, 0), dtype=np.float32))
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def __bool__(self) -> bool:
+        # llama_index tests ``if vector_store:``; an empty store is still a store.
+        return True
+
+    def _match(self, metadata_filter) -> np.ndarray:
+        """Rows matching one filter, or nested filters, as a sorted array."""
+        if isinstance(metadata_filter, MetadataFilters):
+            return self._filter_rows(metadata_filter)
+        key, operator, target = metadata_filter.key, metadata_filter.operator, metadata_filter.value
+        if key in self._postings and operator in (FilterOperator.EQ, FilterOperator.IN):
+            postings = self._postings[key]
+            values = target if operator == FilterOperator.IN else [target]
+            rows = [row for value in values for row in postings.get(value, ())]
+            return np.unique(np.asarray(rows, dtype=np.int64))
+        if operator == FilterOperator.IS_EMPTY:
+            test = lambda value: value is None or value == "" or value == []  # noqa: E731
+        elif operator in comparisons:
+            compare = comparisons[operator]
+            test = lambda value: value is not None and compare(value, target)  # noqa: E731
+        else:
+            raise ValueError("Invalid operator: %s" % operator)
+        return np.asarray(
+            [row for row, meta in enumerate(self._metadata) if test(meta.get(key))], dtype=np.int64
+        )
+
+    def _filter_rows(self, filters) -> np.ndarray:
+        matches = [self._match(metadata_filter) for metadata_filter in filters.filters]
+        if not matches:
+            return np.arange(len(self._ids))
+        rows = matches[0]
+        for other in matches[1:]:
+            if filters.condition == FilterCondition.OR:
+                rows = np.union1d(rows, other)
+            else:
+                rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def _candidate_rows(self, query) -> Optional[np.ndarray]:
+        """Rows the query may return, or None for every live row."""
+        rows = None
+        if query.filters is not None and query.filters.filters:
+            rows = self._filter_rows(query.filters)
+        restrictions = []
+        if query.node_ids is not None:
+            restrictions.append([self._rows_by_id[node_id] for node_id in query.node_ids if node_id in self._rows_by_id])
+        if query.doc_ids is not None:
+            restrictions.append([row for doc_id in query.doc_ids for row in self._rows_by_ref.get(doc_id, ())])
+        for restriction in restrictions:
+            restriction = np.unique(np.asarray(restriction, dtype=np.int64))
+            rows = restriction if rows is None else np.intersect1d(rows, restriction, assume_unique=True)
+        return rows
+
+    @staticmethod
+    def _scores(vectors, added, rows, query_vector) -> np.ndarray:
+        if rows is None:
+            parts = [
+                np.asarray(vectors[start:start + block_rows], dtype=np.float32) @ query_vector
+                for start in range(0, len(vectors), block_rows)
+            ]
+            return np.concatenate(parts + [added @ query_vector])
+        persisted = rows[rows < len(vectors)]
+        extra = rows[rows >= len(vectors)] - len(vectors)
+        return np.concatenate([
+            np.asarray(vectors[persisted], dtype=np.float32) @ query_vector,
+            added[extra] @ query_vector,
+        ])
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise NotImplementedError("MmapVectorStore only supports the default query mode, not %s" % query.mode)
+        with self._lock:
+            vectors, added, alive, ids = self._vectors, self._added, self._alive, self._ids
+            rows = self._candidate_rows(query)
+        if not len(ids) or query.similarity_top_k <= 0:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        query_vector = np.asarray(query.query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector = query_vector / norm
+
+        if rows is None:
+            scores = self._scores(vectors, added, None, query_vector)
+            scores[~alive] = -np.inf
+            rows = np.arange(len(scores))
+            live = int(alive.sum())
+        else:
+            rows = rows[alive[rows]]
+            scores = self._scores(vectors, added, rows, query_vector)
+            live = len(rows)
+
+        top_k = min(query.similarity_top_k, live)
+        if top_k <= 0:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return VectorStoreQueryResult(
+            similarities=[float(scores[i]) for i in top],
+            ids=[ids[rows[i]] for i in top],
+        )
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """Write the live rows to a fresh array file and point the sidecar at it."""
+        with self._lock:
+            current = os.path.exists(persist_path) and not self._dirty
+            if current:
+                return
+            directory = os.path.dirname(persist_path) or "."
+            stem = os.path.splitext(os.path.basename(persist_path))[0]
+            os.makedirs(directory, exist_ok=True)
+
+            rows = np.flatnonzero(self._alive)
+            dim = self._added.shape[1]
+            name = "%s.%s.npy" % (stem, uuid.uuid4().hex[:12])
+            temporary = os.path.join(directory, name + ".tmp")
+            if len(rows):
+                array = np.lib.format.open_memmap(temporary, mode="w+", dtype=self.dtype, shape=(len(rows), dim))
+                for start in range(0, len(rows), block_rows):
+                    block = rows[start:start + block_rows]
+                    array[start:start + len(block)] = self._row_vectors(block)
+                array.flush()
+                del array
+            else:
+                np.save(temporary, np.zeros((0, dim), dtype=self.dtype), allow_pickle=False)
+                os.replace(temporary + ".npy", temporary)
+            os.replace(temporary, os.path.join(directory, name))
+
+            data = {
+                "format": "mmap",
+                "dtype": self.dtype,
+                "dim": dim,
+                "vectors": name,
+                "ids": [self._ids[row] for row in rows],
+                "ref_doc_ids": [self._ref_doc_ids[row] for row in rows],
+                "metadata": [self._metadata[row] for row in rows],
+            }
+            with open(persist_path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(data, file, default=str)
+            os.replace(persist_path + ".tmp", persist_path)
+
+            # Processes still mapping an older array keep it until they let go.
+            for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(stem) + ".*.npy")):
+                if os.path.basename(path) != name:
+                    os.remove(path)
+        self._load(directory, data)
+
+    def _row_vectors(self, rows) -> np.ndarray:
+        """The stored (normalized) vectors of ``rows``."""
+        persisted = rows[rows < len(self._vectors)]
+        extra = rows[rows >= len(self._vectors)] - len(self._vectors)
+        return np.concatenate([
+            np.asarray(self._vectors[persisted], dtype=np.float32),
+            self._added[extra],
+        ])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.batch`."""
+
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from nlp.batch import BatchRunner, Checkpoint, read_batch_file
+
+
+class TestBatch(unittest.TestCase):
+    """Tests for the pipelined batch runner."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.tmp.name, "batch.checkpoint.jsonl")
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def scrape(self, ticker):
+        with self.lock:
+            self.calls.append(("scrape", ticker))
+        path = os.path.join(self.tmp.name, ticker + ".json")
+        with open(path, "w") as f:
+            f.write("[]")
+        time.sleep(0.05)
+        return path
+
+    def generate(self, ticker, media_format, research):
+        with self.lock:
+            self.calls.append(("generate", ticker, media_format))
+        time.sleep(0.05)
+        return ticker + " script", None
+
+    def render(self, ticker, media_format, content, animation_prompt):
+        with self.lock:
+            self.calls.append(("render", ticker, media_format))
+        if ticker == "BAD":
+            raise RuntimeError("render failed")
+        return ticker + "." + media_format
+
+    def runner(self, items):
+        return BatchRunner(
+            items, self.scrape, self.generate, self.render, Checkpoint(self.checkpoint_path),
+            workers={"scrape": 4, "generate": 4, "render": 1},
+        )
+
+    def test_read_batch_file(self):
+        path = os.path.join(self.tmp.name, "tickers.txt")
+        with open(path, "w") as f:
+            f.write("# morning\naapl video\n$MSFT text, audio\n\nNVDA\naapl video\n")
+        assert read_batch_file(path) == [
+            ("AAPL", "video"), ("MSFT", "text"), ("MSFT", "audio"), ("NVDA", "text"),
+        ]
+
+    def test_stages_overlap_and_scrapes_are_shared(self):
+        items = [("T%d" % i, "text") for i in range(8)] + [("T0", "audio")]
+        summary = self.runner(items).run()
+        assert summary["completed"] == 9
+        assert summary["failed"] == 0
+        assert summary["stages"]["scrape"]["count"] == 8
+        assert summary["stages"]["render"]["count"] == 9
+        # 17 stage calls of 50ms each take 0.85s one after another.
+        assert summary["wall_seconds"] < 0.6
+
+    def test_resume_skips_finished_work_and_retries_failures(self):
+        items = [("AAPL", "text"), ("BAD", "text")]
+        summary = self.runner(items).run()
+        assert summary["completed"] == 1
+        assert summary["failures"] == [
+            {"ticker": "BAD", "media_format": "text", "stage": "render", "error": "render failed"}
+        ]
+
+        self.calls = []
+        summary = self.runner(items).run()
+        assert summary["skipped"] == 1
+        assert summary["failed"] == 1
+        # The failed item resumes at render from its checkpointed script.
+        assert self.calls == [("render", "BAD", "text")]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.cache`."""
+
+
+import os
+import tempfile
+import unittest
+
+from nlp.cache import AnimationCache, ArticleCache, CompletionCache, EmbeddingCache
+
+
+class TestArticleCache(unittest.TestCase):
+    """Tests for the scraper's article cache."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "articles.sqlite")
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def test_redirected_link_hits_final_url(self):
+        cache = ArticleCache(self.path, ttl=60)
+        cache.put("https://l.yahoo.com/a", "https://finance.yahoo.com/a", "body", etag='"x"')
+        entry = cache.get("https://l.yahoo.com/a")
+        assert entry["url"] == "https://finance.yahoo.com/a"
+        assert entry["content"] == "body"
+        assert entry["etag"] == '"x"'
+        assert entry["fresh"]
+        assert cache.get("https://finance.yahoo.com/a")["content"] == "body"
+
+    def test_expired_entry_needs_revalidation(self):
+        cache = ArticleCache(self.path, ttl=0)
+        cache.put("u", "u", "body")
+        assert not cache.get("u")["fresh"]
+        cache.ttl = 60
+        cache.revalidated("u")
+        assert cache.get("u")["fresh"]
+
+    def test_lru_eviction(self):
+        cache = ArticleCache(self.path, max_bytes=10)
+        cache.put("a", "a", "12345")
+        cache.put("b", "b", "12345")
+        cache.get("a")
+        cache.put("c", "c", "12345")
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Tests for the content-addressed embedding cache."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def test_round_trip_across_instances(self):
+        cache = EmbeddingCache(self.tmp.name)
+        assert cache.get_many("text-embedding-ada-002", ["a", "b"]) == [None, None]
+        cache.put_many("text-embedding-ada-002", ["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+        cache.put_many("text-embedding-ada-002", ["b", "c"], [[9.0, 9.0], [5.0, 6.0]])
+
+        reopened = EmbeddingCache(self.tmp.name)
+        assert reopened.get_many("text-embedding-ada-002", ["c", "x", "a", "b"]) == [
+            [5.0, 6.0],
+            None,
+            [1.0, 2.0],
+            [3.0, 4.0],
+        ]
+        assert reopened.get_many("other-model", ["a"]) == [None]
+
+    def test_ignores_partial_row_being_appended(self):
+        cache = EmbeddingCache(self.tmp.name)
+        cache.put_many("model", ["a"], [[1.0, 2.0, 3.0]])
+        data_path, _, _ = cache.paths("model")
+        # Another process is partway through appending the next row.
+        with open(data_path, "ab") as file:
+            file.write(b"\0" * 4)
+        assert EmbeddingCache(self.tmp.name).get_many("model", ["a", "b"]) == [[1.0, 2.0, 3.0], None]
+
+
+class TestCompletionCache(unittest.TestCase):
+    """Tests for the chat completion cache."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "completions.sqlite")
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def test_key_depends_on_research_snapshot(self):
+        key = CompletionCache.key("gpt-3.5-turbo-0125", "prompt", "r1")
+        assert key == CompletionCache.key("gpt-3.5-turbo-0125", "prompt", "r1")
+        assert key != CompletionCache.key("gpt-3.5-turbo-0125", "prompt", "r2")
+        assert key != CompletionCache.key("gpt-4", "prompt", "r1")
+
+    def test_ttl_and_size_bound(self):
+        cache = CompletionCache(self.path, ttl=60, max_entries=2)
+        cache.put("a", "script a")
+        cache.put("b", "script b")
+        assert cache.get("a") == "script a"
+        cache.put("c", "script c")
+        assert cache.get("b") is None
+        assert cache.get("a") == "script a"
+        cache.ttl = 0
+        assert cache.get("c") is None
+
+
+class TestAnimationCache(unittest.TestCase):
+    """Tests for the rendered animation cache."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def render(self, cache, key, size):
+        with cache.lock(key):
+            entry = cache.prepare(key)
+            with open(os.path.join(entry, "clip.mp4"), "wb") as f:
+                f.write(b"x" * size)
+            cache.commit(key)
+
+    def test_key_normalizes_prompt(self):
+        key = AnimationCache.key("A  Rocket to the Moon", {"fps": 24, "seed": 1})
+        assert key == AnimationCache.key("a rocket to the moon ", {"seed": 1, "fps": 24})
+        assert key != AnimationCache.key("a rocket to the moon", {"seed": 2, "fps": 24})
+
+    def test_incomplete_entry_is_a_miss(self):
+        cache = AnimationCache(self.tmp.name)
+        cache.prepare("k")
+        assert cache.get("k") is None
+        cache.commit("k")
+        assert cache.get("k") == os.path.join(self.tmp.name, "k", "clip.mp4")
+
+    def test_lru_eviction_skips_locked_entries(self):
+        cache = AnimationCache(self.tmp.name, max_bytes=25)
+        self.render(cache, "a", 10)
+        self.render(cache, "b", 10)
+        os.utime(cache.entry("a"), (0, 0))
+        os.utime(cache.entry("b"), (1, 1))
+        with cache.lock("a"):
+            self.render(cache, "c", 10)
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.compaction`."""
+
+
+import unittest
+
+from nlp.compaction import compact_research, normalize_content
+
+
+STORY = (
+    "Apple shares rose four percent on Tuesday after the company reported record services revenue "
+    "and announced a larger buyback. Analysts said iPhone demand in China remained the main risk "
+    "for the coming quarter, while margins improved on a richer product mix."
+)
+
+
+class TestCompaction(unittest.TestCase):
+    """Tests for the research compaction stage."""
+
+    def test_normalize_strips_boilerplate(self):
+        text = "  Advertisement \n\nApple   rose.\nApple   rose.\nStory continues\n© 2024 Yahoo. All rights reserved."
+        assert normalize_content(text) == "Apple rose."
+
+    def test_drops_failed_and_empty_articles(self):
+        articles = [
+            {"title": "a", "url": "u1", "content": "Failed to fetch article: HTTP 404"},
+            {"title": "b", "url": "u2", "content": "Error fetching the article: timeout"},
+            {"title": "c", "url": "u3", "content": "Content not found - page may use dynamic loading"},
+            {"title": "d", "url": "u4", "content": "Too short."},
+            {"title": "e", "url": "u5", "content": STORY},
+        ]
+        assert [a["title"] for a in compact_research(articles)] == ["e"]
+
+    def test_collapses_syndicated_copies(self):
+        articles = [
+            {"title": "Reuters", "url": "u1", "content": STORY},
+            {"title": "Other", "url": "u2", "content": "Microsoft " + STORY.replace("Apple", "Microsoft")[::-1]},
+            {"title": "Syndicated", "url": "u3", "content": STORY + " Reporting by Jane Doe."},
+        ]
+        compacted = compact_research(articles)
+        assert [a["url"] for a in compacted] == ["u3", "u2"]
+
+    def test_token_budget(self):
+        articles = [
+            {"title": str(i), "url": "u%d" % i, "content": " ".join("w%d_%d" % (i, j) for j in range(400))}
+            for i in range(10)
+        ]
+        compacted = compact_research(articles, token_budget=1200)
+        assert 1 < len(compacted) < 10
+        assert sum(len(a["content"]) for a in compacted) <= 1200 * 4
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.conversation`."""
+
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+from llama_index.core import MockEmbedding, StorageContext, VectorStoreIndex
+
+from nlp import config, conversation as conversation_module
+from nlp.classes import SharedConversation
+from nlp.conversation import Conversation, HybridRetriever
+from nlp.parser import TickerIndex
+from nlp.store import ResearchStore
+from nlp.vectorstore import MmapVectorStore
+
+
+class TestHybridRetriever(unittest.TestCase):
+    """Tests for ticker-scoped hybrid retrieval."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ResearchStore(os.path.join(self.tmp.name, "research.sqlite"))
+        self.store.save("AAPL", [
+            {"title": "Services", "url": "u1", "content": "Apple services revenue hit a record"},
+            {"title": "Buyback", "url": "u2", "content": "Apple announced a larger share buyback"},
+        ])
+        self.store.save("MSFT", [
+            {"title": "Buyback", "url": "u3", "content": "Microsoft announced a share buyback too"},
+        ])
+        documents = []
+        for name, digest in [("%s:%d" % entry[:2], entry[2]) for entry in self.store.entries()]:
+            ticker, article_id = name.split(":")
+            article = self.store.articles([int(article_id)])[int(article_id)]
+            documents.append(Conversation.article_document(name, ticker, article))
+        # Every text embeds to the same vector, so any ordering comes from
+        # the filters and the BM25 ranking.
+        self.index = VectorStoreIndex.from_documents(
+            documents,
+            storage_context=StorageContext.from_defaults(vector_store=self.vector_store()),
+            embed_model=MockEmbedding(embed_dim=8),
+        )
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def vector_store(self):
+        return None
+
+    def retriever(self, **kwargs):
+        return HybridRetriever(self.index, {"AAPL", "MSFT"}, ticker_index=TickerIndex(), store=self.store, **kwargs)
+
+    def test_question_is_scoped_to_its_ticker(self):
+        nodes = self.retriever(similarity_top_k=5).retrieve("What did MSFT announce?")
+        assert [node.metadata["ticker"] for node in nodes] == ["MSFT"]
+        assert self.retriever().scope("How is Apple's EV business doing?") == ["AAPL"]
+
+    def test_lexical_ranking_is_fused(self):
+        nodes = self.retriever(similarity_top_k=1).retrieve("How big is the AAPL buyback?")
+        assert [node.metadata["url"] for node in nodes] == ["u2"]
+
+    def test_falls_back_without_lexical_match(self):
+        nodes = self.retriever(similarity_top_k=5).retrieve("Any AAPL guidance changes?")
+        assert sorted(node.metadata["url"] for node in nodes) == ["u1", "u2"]
+        nodes = self.retriever(similarity_top_k=5, lexical_top_k=0).retrieve("anything new?")
+        assert len(nodes) == 3
+
+
+class TestHybridRetrieverMmap(TestHybridRetriever):
+    """The same retrieval over the memory-mapped vector store."""
+
+    def vector_store(self):
+        return MmapVectorStore()
+
+    def test_index_uses_mmap_store(self):
+        assert isinstance(self.index.vector_store, MmapVectorStore)
+
+
+class TestConversation(unittest.TestCase):
+    """Tests for building, refreshing and reloading the Conversation index."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_config = {
+            section: dict(config[section]) for section in ("conversation", "research") if config.has_section(section)
+        }
+        config.read_string(
+            "[conversation]\nvector_store = mmap\n[research]\nstore = %s\nconversation_hours = 0\n"
+            % os.path.join(self.tmp.name, "research.sqlite")
+        )
+        self.saved_store = ResearchStore._shared
+        self.store = ResearchStore(os.path.join(self.tmp.name, "research.sqlite"))
+        ResearchStore._shared = self.store
+        tmp = self.tmp.name
+
+        class TestingConversation(Conversation):
+            PERSIST_DIR = os.path.join(tmp, "storage")
+            RESEARCH_DIR = os.path.join(tmp, "research")
+
+            @staticmethod
+            def get_embed_model():
+                return MockEmbedding(embed_dim=8)
+
+        self.Conversation = TestingConversation
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        ResearchStore._shared = self.saved_store
+        for section in ("conversation", "research"):
+            config.remove_section(section)
+        config.read_dict(self.saved_config)
+        self.tmp.cleanup()
+
+    def test_build_and_reload_mmap_index(self):
+        self.store.save("AAPL", [{"title": "t", "url": "u1", "content": "Apple services revenue hit a record"}])
+        built = self.Conversation()
+        assert isinstance(built.index.vector_store, MmapVectorStore)
+        assert len(built.index.vector_store) == 1
+
+        reloaded = self.Conversation()
+        assert isinstance(reloaded.index.vector_store, MmapVectorStore)
+        assert isinstance(reloaded.index.vector_store._vectors, np.memmap)
+        nodes = reloaded.index.as_retriever().retrieve("services revenue")
+        assert [node.metadata["url"] for node in nodes] == ["u1"]
+
+    def test_reload_empty_mmap_index(self):
+        self.store.save("AAPL", [
+            {"title": "t", "url": "u1", "content": "an old story", "published_at": time.time() - 30 * 86400},
+        ])
+        self.Conversation()
+        config.set("research", "conversation_hours", "24")
+        emptied = self.Conversation()
+        assert isinstance(emptied.index.vector_store, MmapVectorStore)
+        assert len(emptied.index.vector_store) == 0 and emptied.manifest == {}
+
+        reloaded = self.Conversation()
+        assert isinstance(reloaded.index.vector_store, MmapVectorStore)
+        assert len(reloaded.index.vector_store) == 0
+
+    def write_research(self, name, text):
+        os.makedirs(self.Conversation.RESEARCH_DIR, exist_ok=True)
+        with open(os.path.join(self.Conversation.RESEARCH_DIR, name), "w") as f:
+            f.write(text)
+
+    def counts(self, conversation):
+        return len(conversation.index.docstore.docs), len(conversation.index.vector_store)
+
+    def test_refresh_touches_only_changed_sources(self):
+        config.set("research", "store", "")
+        embedded = []
+
+        class CountingEmbedding(MockEmbedding):
+            def _get_text_embeddings(self, texts):
+                embedded.extend(texts)
+                return super()._get_text_embeddings(texts)
+
+        self.Conversation.get_embed_model = staticmethod(lambda: CountingEmbedding(embed_dim=8))
+        self.write_research("AAPL.json", "Apple services revenue hit a record.")
+        self.write_research("MSFT.json", "Microsoft cloud growth slowed.")
+        conversation = self.Conversation()
+        assert sorted(conversation.manifest) == ["AAPL.json", "MSFT.json"]
+        assert self.counts(conversation) == (2, 2)
+        msft = conversation.manifest["MSFT.json"]
+        assert len(embedded) == 2
+        assert conversation.refresh() is False
+
+        embedded.clear()
+        self.write_research("AAPL.json", "Apple announced a larger buyback.")
+        assert conversation.refresh() is True
+        assert [text for text in embedded if "buyback" in text] == embedded and len(embedded) == 1
+        assert conversation.manifest["MSFT.json"] == msft
+        assert self.counts(conversation) == (2, 2)
+
+        os.remove(os.path.join(self.Conversation.RESEARCH_DIR, "MSFT.json"))
+        reloaded = self.Conversation()
+        assert sorted(reloaded.manifest) == ["AAPL.json"]
+        assert self.counts(reloaded) == (1, 1)
+        nodes = reloaded.index.as_retriever().retrieve("buyback")
+        assert [node.metadata["ticker"] for node in nodes] == ["AAPL"]
+
+    def test_store_without_manifest_is_reindexed_once(self):
+        config.set("research", "store", "")
+        self.write_research("AAPL.json", "Apple services revenue hit a record.")
+        self.write_research("MSFT.json", "Microsoft cloud growth slowed.")
+        self.Conversation()
+        os.remove(os.path.join(self.Conversation.PERSIST_DIR, "research_manifest.json"))
+        rebuilt = self.Conversation()
+        assert sorted(rebuilt.manifest) == ["AAPL.json", "MSFT.json"]
+        assert self.counts(rebuilt) == (2, 2)
+        assert self.counts(self.Conversation()) == (2, 2)
+
+
+class TestSharedConversation(unittest.TestCase):
+    """Tests for reloading the shared Conversation."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        release = threading.Event()
+
+        class SlowConversation:
+            disk_version = 1
+            built = []
+
+            def __init__(self):
+                # Every build after the first blocks until released.
+                if self.built:
+                    release.wait(5)
+                self.built.append(self)
+
+            @classmethod
+            def version(cls):
+                return cls.disk_version
+
+            def query(self, query):
+                return self
+
+        self.release = release
+        self.SlowConversation = SlowConversation
+        conversation_module.Conversation = SlowConversation
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.release.set()
+        conversation_module.Conversation = Conversation
+
+    def test_reload_does_not_block_questions(self):
+        shared = SharedConversation()
+        first = shared.query("q")
+        assert shared.get() is first
+
+        self.SlowConversation.disk_version = 2
+        started = time.monotonic()
+        assert shared.query("q") is first
+        assert shared.query("q") is first
+        assert time.monotonic() - started < 1
+        reloader = shared.reloader
+        assert reloader is not None
+
+        self.release.set()
+        reloader.join(5)
+        second = shared.query("q")
+        assert second is not first and len(self.SlowConversation.built) == 2
+        assert shared.reloader is None
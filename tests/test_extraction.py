@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for article extraction in `nlp.classes.WebScraper`."""
+
+
+import glob
+import os
+import unittest
+
+from bs4 import BeautifulSoup
+
+from nlp.classes import WebScraper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "articles")
+
+
+def legacy_extract(html):
+    """The original full-tree extraction, kept as the reference output."""
+    soup = BeautifulSoup(html, "html.parser")
+    article_content = soup.find("div", {"class": "caas-body"}) or soup.find("article")
+    return article_content.text if article_content else None
+
+
+class TestExtraction(unittest.TestCase):
+    """Targeted extraction must match the full-tree parse."""
+
+    def test_fixture_corpus_matches_full_parse(self):
+        paths = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+        assert paths
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as file:
+                html = file.read()
+            with self.subTest(fixture=os.path.basename(path)):
+                self.assertEqual(WebScraper.extract_content(html), legacy_extract(html))
+
+    def test_missing_body(self):
+        with open(os.path.join(FIXTURES, "no_content.html"), "r", encoding="utf-8") as file:
+            assert WebScraper.extract_content(file.read()) is None
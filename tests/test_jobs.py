@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.jobs`."""
+
+
+import os
+import tempfile
+import threading
+import unittest
+
+from nlp.jobs import ArtifactJanitor, JobQueue
+
+
+class TestJobQueue(unittest.TestCase):
+    """Tests for the background job queue."""
+
+    def test_job_lifecycle(self):
+        release = threading.Event()
+
+        def run(job):
+            job.set_stage("scrape")
+            release.wait(5)
+            return "output/news.txt"
+
+        queue = JobQueue(run, max_workers=1)
+        job = queue.submit(("text", "AAPL"))
+        assert queue.get(job.id) is job
+        assert not job.finished
+        release.set()
+        queue.executor.shutdown(wait=True)
+        assert job.status == "done"
+        assert job.stage == "scrape"
+        assert job.result == "output/news.txt"
+
+    def test_failed_job_records_error(self):
+        def run(job):
+            raise ValueError("no news")
+
+        queue = JobQueue(run, max_workers=1)
+        job = queue.submit(("text", "AAPL"))
+        queue.executor.shutdown(wait=True)
+        assert job.status == "failed"
+        assert job.error == "no news"
+
+    def test_prunes_oldest_finished_jobs(self):
+        queue = JobQueue(lambda job: None, max_workers=1, keep=2)
+        first = queue.submit(("text", "A"))
+        queue.submit(("text", "B"))
+        queue.executor.submit(lambda: None).result()
+        queue.submit(("text", "C"))
+        queue.executor.shutdown(wait=True)
+        assert queue.get(first.id) is None
+        assert len(queue.jobs) == 2
+
+
+class TestArtifactJanitor(unittest.TestCase):
+    """Tests for the output directory janitor."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def make_job_dir(self, name, size, mtime):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(path)
+        with open(os.path.join(path, "speech.mp3"), "wb") as file:
+            file.write(b"x" * size)
+        os.utime(path, (mtime, mtime))
+
+    def test_evicts_least_recently_served(self):
+        self.make_job_dir("a" * 32, 10, 100)
+        self.make_job_dir("b" * 32, 10, 200)
+        self.make_job_dir("c" * 32, 10, 300)
+        os.makedirs(os.path.join(self.tmp.name, "video_frames"))
+        janitor = ArtifactJanitor(self.tmp.name, max_bytes=20, protect=lambda: {"a" * 32})
+        janitor.touch("b" * 32)
+        assert janitor.sweep() == ["c" * 32]
+        assert sorted(os.listdir(self.tmp.name)) == ["a" * 32, "b" * 32, "video_frames"]
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.classes.Media` helpers."""
+
+
+import unittest
+
+from nlp.classes import Media
+
+
+class TestSplitScript(unittest.TestCase):
+    """Tests for splitting narration into TTS chunks."""
+
+    def test_short_script_is_one_chunk(self):
+        assert Media.split_script("Hello there. Welcome back.", 100) == ["Hello there. Welcome back."]
+
+    def test_chunks_respect_limit_and_keep_text(self):
+        script = "\n\n".join("Sentence %d is here. And another one follows it." % i for i in range(20))
+        chunks = Media.split_script(script, 120)
+        assert len(chunks) > 1
+        assert all(len(chunk) <= 120 for chunk in chunks)
+        assert " ".join(" ".join(chunks).split()) == " ".join(script.split())
+
+    def test_paragraph_separator_counts_toward_limit(self):
+        assert Media.split_script("aaaa\n\nbbbbb", 10) == ["aaaa", "bbbbb"]
+        assert Media.split_script("aaaa\n\nbbbb", 10) == ["aaaa\n\nbbbb"]
+
+    def test_sentences_of_one_paragraph_rejoin_with_spaces(self):
+        script = "First one here. Second one here.\n\nNext paragraph."
+        assert Media.split_script(script, 40) == ["First one here. Second one here.", "Next paragraph."]
+        assert Media.split_script("One. Two. Three is longer.", 16) == ["One. Two.", "Three is longer."]
+
+    def test_long_sentence_is_split_on_words(self):
+        chunks = Media.split_script("word " * 100, 50)
+        assert all(len(chunk) <= 50 for chunk in chunks)
+        assert " ".join(chunks).split() == ["word"] * 100
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.metrics`."""
+
+
+import json
+import os
+import tempfile
+import unittest
+
+from nlp.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for stage timings, counters and the trace dump."""
+
+    def test_prometheus_rendering(self):
+        metrics = Metrics()
+        metrics.inc("nlp_cache_requests_total", cache="article", result="hit")
+        metrics.inc("nlp_cache_requests_total", 2, cache="article", result="hit")
+        with metrics.stage("scrape"):
+            pass
+        with self.assertRaises(ValueError):
+            with metrics.call("openai", "tts-1"):
+                raise ValueError("boom")
+
+        text = metrics.render()
+        assert '# TYPE nlp_cache_requests_total counter' in text
+        assert 'nlp_cache_requests_total{cache="article",result="hit"} 3' in text
+        assert 'nlp_stage_seconds_bucket{stage="scrape",le="+Inf"} 1' in text
+        assert 'nlp_stage_seconds_count{stage="scrape"} 1' in text
+        assert 'nlp_external_call_errors_total{model="tts-1",provider="openai"} 1' in text
+
+    def test_trace_records_nested_spans(self):
+        metrics = Metrics()
+        metrics.tracing = True
+        with metrics.stage("generate"):
+            with metrics.call("openai", "gpt-3.5-turbo-0125"):
+                pass
+        metrics.inc("nlp_tokens_total", 12, model="gpt-3.5-turbo-0125", kind="prompt")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            metrics.dump_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        call, stage = trace["spans"]
+        assert stage["name"] == "generate" and stage["parent"] is None
+        assert call["parent"] == stage["id"]
+        assert call["labels"] == {"provider": "openai", "model": "gpt-3.5-turbo-0125"}
+        assert trace["counters"][0]["value"] == 12
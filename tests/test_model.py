@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.classes.Model` helpers."""
+
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from nlp.classes import Model
+from nlp.ratelimit import estimate_tokens
+from nlp.store import ResearchStore
+
+
+class OfflineModel(Model):
+    """Model without a completion cache, so tests never touch NLP_HOME."""
+
+    @classmethod
+    def get_completion_cache(cls):
+        return None
+
+
+class StubModel(OfflineModel):
+    """Model whose completions come from ``reply(message_thread)`` instead of the API."""
+
+    reply = staticmethod(lambda message_thread: "summary")
+
+    def complete(self, message_thread):
+        self.calls.append(message_thread)
+        return self.reply(message_thread)
+
+
+class TestCondenseResearch(unittest.TestCase):
+    """Tests for chunking and map-reducing large research."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "AAPL.json")
+        with open(path, "w") as f:
+            json.dump([], f)
+        self.model = StubModel(path, ("text", "AAPL"), None)
+        self.model.calls = []
+        self.model.chunk_tokens = 250
+        self.model.map_reduce_threshold = 1000
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    @staticmethod
+    def articles(count, words=70):
+        return [{"title": "t%d" % i, "content": " ".join(["word%d" % i] * words)} for i in range(count)]
+
+    def test_chunks_on_article_boundaries(self):
+        articles = self.articles(6)
+        chunks = self.model.research_chunks(json.dumps(articles))
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= self.model.chunk_tokens + 1 for chunk in chunks)
+        parsed = [json.loads(piece) for chunk in chunks for piece in chunk.split("\n\n")]
+        assert parsed == articles
+
+    def test_oversized_article_is_split(self):
+        article = {"title": "long", "content": "x" * 5000}
+        chunks = self.model.research_chunks(json.dumps([article]))
+        assert len(chunks) > 1
+        assert all(len(chunk) <= self.model.chunk_tokens * 4 for chunk in chunks)
+        assert "".join(chunks) == json.dumps(article)
+
+    def test_small_research_is_sent_as_is(self):
+        self.model.research = json.dumps(self.articles(2))
+        assert self.model.condense_research() == self.model.research
+        assert self.model.calls == []
+
+    def test_large_research_is_map_reduced(self):
+        self.model.research = json.dumps(self.articles(20))
+        condensed = self.model.condense_research()
+        assert estimate_tokens(condensed) <= self.model.map_reduce_threshold
+        assert set(condensed.split("\n\n")) == {"summary"}
+        assert len(self.model.calls) > 1
+
+    def test_stops_when_summaries_do_not_shrink(self):
+        research = json.dumps(self.articles(20))
+        self.model.research = research
+        self.model.reply = lambda message_thread: message_thread * 2
+        assert self.model.condense_research() == research
+        self.model.condensed_research = None
+        self.model.reply = lambda message_thread: message_thread.split("###")[1]
+        assert len(self.model.condense_research()) <= len(research)
+
+
+class TestLoadResearch(unittest.TestCase):
+    """Tests for reading research from the research store."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_store = ResearchStore._shared
+        self.store = ResearchStore(os.path.join(self.tmp.name, "research.sqlite"))
+        ResearchStore._shared = self.store
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        ResearchStore._shared = self.saved_store
+        self.tmp.cleanup()
+
+    def titles(self, ticker):
+        model = OfflineModel(self.store.path, ("text", ticker), None)
+        return [article["title"] for article in json.loads(model.research)]
+
+    def test_recent_window(self):
+        now = time.time()
+        content = "Apple reported record services revenue and raised its dividend again this quarter " * 3
+        self.store.save("AAPL", [
+            {"title": "new", "url": "u1", "content": content, "published_at": now - 3600},
+            {"title": "old", "url": "u2", "content": "Older " + content, "published_at": now - 5 * 86400},
+        ])
+        assert self.titles("AAPL") == ["new"]
+
+    def test_quiet_ticker_falls_back_to_latest_scrape(self):
+        now = time.time()
+        content = "The utility kept its guidance unchanged and announced no new projects this month " * 3
+        self.store.save("XEL", [
+            {"title": "stale", "url": "u1", "content": "Stale " + content, "published_at": now - 30 * 86400},
+        ], scraped_at=now - 86400)
+        self.store.save("XEL", [
+            {"title": "quiet", "url": "u2", "content": content, "published_at": now - 5 * 86400},
+        ])
+        assert self.titles("XEL") == ["quiet"]
+        assert self.titles("NONE") == []
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.parser`."""
+
+
+import unittest
+
+from nlp.parser import TickerIndex
+
+
+class TestTickerIndex(unittest.TestCase):
+    """Tests for the local request parser."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.index = TickerIndex()
+
+    def test_ticker_and_format(self):
+        assert self.index.parse("AAPL video") == ["video", "AAPL"]
+        assert self.index.parse("Give me a podcast on $nvda") == ["audio", "NVDA"]
+        assert self.index.parse("PLTR text please") == ["text", "PLTR"]
+
+    def test_company_names(self):
+        assert self.index.parse("I'd like to listen to news about microsoft") == ["audio", "MSFT"]
+        assert self.index.parse("Bank of America newsletter") == ["text", "BAC"]
+        assert self.index.parse("video on Johnson & Johnson") == ["video", "JNJ"]
+
+    def test_fuzzy_company_names(self):
+        assert self.index.parse("how is nvidai doing? video") == ["video", "NVDA"]
+        assert self.index.lookup("Microsft") == "MSFT"
+
+    def test_ambiguous_requests_fall_through(self):
+        assert self.index.parse("AAPL") is None
+        assert self.index.parse("AAPL or MSFT video") is None
+        assert self.index.parse("AAPL video and audio") is None
+        assert self.index.parse("what's going on in the markets, text me") is None
+
+    def test_acronyms_do_not_beat_company_names(self):
+        assert self.index.find_tickers("How is Tesla's EV business doing? text") == {"TSLA"}
+        assert self.index.parse("How is Tesla's EV business doing? text") is None
+        assert self.index.parse("Apple after the IPO buzz, audio") is None
+        assert self.index.parse("Nvidia AI news video") is None
+        assert self.index.parse("Microsoft earnings and EPS, text") is None
+        assert self.index.parse("CEO news about Tesla text") is None
+        assert self.index.parse("How is Tesla's business doing? text") == ["text", "TSLA"]
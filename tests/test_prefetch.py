@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.prefetch`."""
+
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from nlp.prefetch import Prefetcher, parse_tickers
+
+
+class TestPrefetcher(unittest.TestCase):
+    """Tests for the background prefetcher."""
+
+    def test_refreshes_watchlist_and_popular_tickers(self):
+        refreshed = []
+
+        def refresh(ticker):
+            if ticker == "BAD":
+                raise RuntimeError("no news")
+            refreshed.append(ticker)
+
+        prefetcher = Prefetcher(
+            refresh, watchlist=["AAPL", "BAD"], popular=lambda limit: ["MSFT", "AAPL", "TSLA"][:limit], top=2,
+        )
+        results = prefetcher.run_once(spread=0)
+        assert results == {"AAPL": "done", "BAD": "failed", "MSFT": "done"}
+        assert sorted(refreshed) == ["AAPL", "MSFT"]
+
+    def test_concurrency_limit(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def refresh(ticker):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        prefetcher = Prefetcher(refresh, watchlist=["T%d" % i for i in range(8)], workers=3)
+        assert set(prefetcher.run_once(spread=0.05).values()) == {"done"}
+        assert running[1] <= 3
+
+    def test_one_pass_at_a_time_across_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            lock_path = os.path.join(directory, "prefetch.lock")
+            first = Prefetcher(lambda ticker: None, watchlist=["AAPL"], lock_path=lock_path)
+            second = Prefetcher(lambda ticker: None, watchlist=["AAPL"], lock_path=lock_path)
+            with first.exclusive() as acquired:
+                assert acquired
+                assert second.run_once(spread=0) is None
+            assert second.run_once(spread=0) == {"AAPL": "done"}
+
+    def test_parse_tickers(self):
+        assert parse_tickers("aapl, $MSFT  AAPL") == ["AAPL", "MSFT"]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.ratelimit`."""
+
+
+import configparser
+import time
+import unittest
+from types import SimpleNamespace
+
+from nlp.ratelimit import Governor, RateLimiter, TokenBucket, retry_after
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers=headers)
+
+
+class TestRateLimit(unittest.TestCase):
+    """Tests for the token buckets and retry governor."""
+
+    def test_bucket_blocks_until_refilled(self):
+        bucket = TokenBucket(600)
+        bucket.tokens = 0
+        start = time.monotonic()
+        bucket.acquire(1)
+        assert time.monotonic() - start >= 0.09
+
+    def test_retry_after_headers(self):
+        assert retry_after(RateLimitError({"retry-after": "2"})) == 2.0
+        assert retry_after(RateLimitError({"retry-after-ms": "150"})) == 0.15
+        assert retry_after(ValueError()) is None
+        assert retry_after(RateLimitError({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+        assert retry_after(RateLimitError({"retry-after": "soon"})) is None
+
+    def test_governor_retries_rate_limits(self):
+        calls = []
+
+        def flaky():
+            calls.append(time.monotonic())
+            if len(calls) < 3:
+                raise RateLimitError({"retry-after-ms": "20"})
+            return "ok"
+
+        governor = Governor(max_retries=5)
+        assert governor.call(flaky) == "ok"
+        assert len(calls) == 3
+        assert calls[1] - calls[0] >= 0.02
+
+    def test_governor_does_not_retry_other_errors(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            Governor(max_retries=5).call(broken)
+        assert calls == [1]
+
+    def test_model_limits_override_provider_limits(self):
+        config = configparser.RawConfigParser()
+        config.read_string("[ratelimit]\nopenai_rpm = 3500\nopenai.tts-1_rpm = 50\n")
+        limiter = RateLimiter(config)
+        assert limiter.governor("openai", "tts-1").requests.rate == 50
+        assert limiter.governor("openai", "gpt-3.5-turbo-0125").requests.rate == 3500
+        assert limiter.governor("openai", "tts-1") is limiter.governor("openai", "tts-1")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.store`."""
+
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from nlp.store import ResearchStore
+
+
+class TestResearchStore(unittest.TestCase):
+    """Tests for the SQLite research store."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ResearchStore(os.path.join(self.tmp.name, "research.sqlite"))
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def test_syndicated_articles_are_stored_once(self):
+        ids = self.store.save("AAPL", [
+            {"title": "Supply deal", "url": "https://a/1", "content": "Nvidia and Apple sign a chip supply deal"},
+            {"title": "Missing", "url": "https://a/2", "content": "Failed to fetch article: HTTP 404"},
+        ])
+        assert len(ids) == 1
+        assert self.store.save("NVDA", [
+            {"title": "Supply deal", "url": "https://b/9", "content": "Nvidia and  Apple sign a chip supply deal\n"},
+        ]) == ids
+        assert [entry[:2] for entry in sorted(self.store.entries())] == [("AAPL", ids[0]), ("NVDA", ids[0])]
+        assert self.store.recent("NVDA")[0]["url"] == "https://a/1"
+
+    def test_recent_window_and_history(self):
+        now = time.time()
+        self.store.save("AAPL", [
+            {"title": "old", "url": "u1", "content": "old news", "published_at": now - 72 * 3600},
+        ], scraped_at=now - 3600)
+        self.store.save("AAPL", [
+            {"title": "new", "url": "u2", "content": "new news", "published_at": now - 60},
+            {"title": "newer", "url": "u3", "content": "newer news", "published_at": now - 30},
+        ])
+        assert [a["title"] for a in self.store.recent("AAPL")] == ["new", "newer", "old"]
+        assert [a["title"] for a in self.store.recent("AAPL", hours=48)] == ["new", "newer"]
+        assert [a["title"] for a in self.store.recent("AAPL", limit=1)] == ["new"]
+        assert self.store.recent("MSFT") == []
+
+    def test_full_text_search_by_ticker(self):
+        self.store.save("AAPL", [{"title": "iPhone", "url": "u1", "content": "record iphone revenue"}])
+        self.store.save("MSFT", [{"title": "Cloud", "url": "u2", "content": "azure cloud revenue growth"}])
+        assert [article_id for article_id, _ in self.store.search("cloud revenue")][0] == 2
+        assert [article_id for article_id, _ in self.store.search("revenue", ticker="AAPL")] == [1]
+        assert self.store.search("iphone", ticker="MSFT") == []
+        assert sorted(article_id for article_id, _ in self.store.search("revenue", ticker=["AAPL", "MSFT"])) == [1, 2]
+
+    def test_changed_article_replaces_body(self):
+        self.store.save("AAPL", [{"title": "t", "url": "u1", "content": "first draft"}])
+        version = self.store.version()
+        self.store.save("AAPL", [{"title": "t", "url": "u1", "content": "updated story"}])
+        assert self.store.recent("AAPL")[0]["content"] == "updated story"
+        assert self.store.search("draft") == []
+        assert self.store.version() != version
+
+    def test_popular_and_last_scraped(self):
+        now = time.time()
+        for ticker, age in [("AAPL", 60), ("MSFT", 30), ("MSFT", 20), ("TSLA", 48 * 3600)]:
+            self.store.record_request(ticker, requested_at=now - age)
+        assert self.store.popular(hours=24) == ["MSFT", "AAPL"]
+        assert self.store.popular(hours=72, limit=1) == ["MSFT"]
+        assert self.store.last_scraped("AAPL") is None
+        self.store.save("AAPL", [{"title": "t", "url": "u1", "content": "news"}], scraped_at=now - 5)
+        assert self.store.last_scraped("AAPL") == now - 5
+
+    def test_import_legacy_json(self):
+        directory = os.path.join(self.tmp.name, "research")
+        os.makedirs(directory)
+        with open(os.path.join(directory, "TSLA.json"), "w") as f:
+            json.dump([{"title": "t", "url": "u1", "content": "deliveries beat estimates"}], f)
+        self.store.import_json(directory)
+        assert self.store.recent("TSLA")[0]["content"] == "deliveries beat estimates"
+        assert ResearchStore.is_store(self.store.path)
+        assert not ResearchStore.is_store(os.path.join(directory, "TSLA.json"))
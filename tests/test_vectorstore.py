@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `nlp.vectorstore`."""
+
+
+import glob
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores import (
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    SimpleVectorStore,
+    VectorStoreQuery,
+)
+
+from nlp.vectorstore import MmapVectorStore
+
+
+def make_node(node_id, ref_doc_id, embedding, **metadata):
+    return TextNode(
+        id_=node_id,
+        text=node_id,
+        embedding=list(embedding),
+        metadata=metadata,
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=ref_doc_id)},
+    )
+
+
+class TestMmapVectorStore(unittest.TestCase):
+    """Tests for the memory-mapped vector store."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "default__vector_store.json")
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(40, 16))
+        self.nodes = [
+            make_node("n%d" % i, "doc%d" % (i // 4), self.embeddings[i], ticker="AAPL" if i % 2 else "MSFT", rank=i)
+            for i in range(40)
+        ]
+        self.query = rng.normal(size=16)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmp.cleanup()
+
+    def expected(self, rows, top_k):
+        vectors = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        scores = vectors[rows] @ (self.query / np.linalg.norm(self.query))
+        return ["n%d" % rows[i] for i in np.argsort(-scores)[:top_k]]
+
+    def search(self, store, top_k=5, filters=None):
+        return store.query(VectorStoreQuery(query_embedding=list(self.query), similarity_top_k=top_k, filters=filters))
+
+    def test_matches_brute_force_cosine(self):
+        store = MmapVectorStore()
+        store.add(self.nodes)
+        result = self.search(store)
+        assert result.ids == self.expected(list(range(40)), 5)
+        assert result.similarities == sorted(result.similarities, reverse=True)
+
+    def test_filters_and_deletes(self):
+        store = MmapVectorStore()
+        store.add(self.nodes)
+        store.delete("doc0")
+        filters = MetadataFilters(filters=[
+            MetadataFilter(key="ticker", value="AAPL"),
+            MetadataFilter(key="rank", value=30, operator=FilterOperator.LT),
+        ])
+        rows = [i for i in range(4, 30) if i % 2]
+        assert self.search(store, top_k=50, filters=filters).ids == self.expected(rows, 50)
+        assert len(store) == 36
+
+    def test_persist_maps_array_and_keeps_adding(self):
+        store = MmapVectorStore(dtype="float16")
+        store.add(self.nodes[:30])
+        store.delete("doc1")
+        store.persist(self.path)
+        loaded = MmapVectorStore.from_persist_path(self.path)
+        assert isinstance(loaded._vectors, np.memmap)
+        assert loaded._vectors.dtype == np.float16 and loaded._vectors.shape == (26, 16)
+        loaded.add(self.nodes[30:])
+        rows = [i for i in range(40) if i // 4 != 1]
+        assert self.search(loaded, top_k=10).ids == self.expected(rows, 10)
+        loaded.persist(self.path)
+        assert len(glob.glob(os.path.join(self.tmp.name, "*.npy"))) == 1
+        assert self.search(MmapVectorStore.from_persist_path(self.path), top_k=10).ids == self.expected(rows, 10)
+
+    def test_converts_simple_vector_store(self):
+        simple = SimpleVectorStore()
+        simple.add(self.nodes)
+        simple.persist(self.path)
+        store = MmapVectorStore.from_persist_path(self.path)
+        assert self.search(store).ids == self.expected(list(range(40)), 5)
+        assert isinstance(MmapVectorStore.from_persist_path(self.path)._vectors, np.memmap)